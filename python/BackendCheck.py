@@ -0,0 +1,96 @@
+'''
+Checks that the jit backend (see Scanner.setBackend and Kernels.py)
+gives exactly the same results as the numpy backend: the same binary
+plane and the same codes (code, location, unit, orientation and
+confidence) on synthetic frames (see Render.py), with and without run
+tables, and the same readUnit, xdist/ydist and readCodes results at
+every candidate pixel (with the sectors showing the bulls-eye rings).
+
+Without numba the kernels are checked as plain Python, which is slow,
+so keep the frames small.  Exits with status 1 on any difference.
+
+usage: python BackendCheck.py [--sizes 160x120,320x240] [--counts 2,6]
+'''
+import sys
+import argparse
+import numpy as np
+import Kernels
+from Scanner import Scanner
+from TopCode import TopCode
+from Render import randomCodes, renderScene
+
+
+'''
+Returns a scanner using the given backend.  Without numba the jit
+backend runs the kernels uncompiled.
+'''
+def scanner(backend, runTables):
+	s = Scanner()
+	s.setRunTables(runTables)
+	if (backend == 'jit' and not Kernels.AVAILABLE):
+		s.jit = True
+	else:
+		s.setBackend(backend)
+	s.warmup()
+	return s
+
+
+'''
+Returns the binary plane and the codes found in image by a scanner
+using the given backend.
+'''
+def scan(image, backend, runTables):
+	s = scanner(backend, runTables)
+	codes = s.scan(image = image)
+	return s.bw.copy(), [ (c.code, c.x, c.y, c.unit, c.orientation, c.confidence) for c in codes ]
+
+
+'''
+Returns the number of candidate pixels of image where the numpy and
+jit backends read a different unit, ring distance or code.
+'''
+def compareKernels(image, runTables):
+	s = scanner('numpy', runTables)
+	s.load(image)
+	s.markCandidates()
+	ys, xs = np.nonzero(s.candidates)
+	steps = np.arange(0, TopCode.ARC_STEPS)
+	diffs = 0
+	for x, y in zip(xs, ys):
+		top = TopCode()
+		top.x, top.y = x + 0.3, y - 0.2
+		units = np.repeat(4.0 + x % 7, len(steps))
+		results = []
+		for jit in (False, True):
+			s.jit = jit
+			dists = [ s.xdist(x, y, 1), s.xdist(x, y, -1), s.ydist(x, y, 1), s.ydist(x, y, -1) ]
+			intact = np.empty(len(steps), np.int64)
+			conf, bits = top.readCodes(s, units, steps, intact)
+			results.append((top.readUnit(s), dists, list(conf), list(bits), list(intact)))
+		diffs += results[0] != results[1]
+	return diffs
+
+
+parser = argparse.ArgumentParser(description = 'Parity check of the jit and numpy scanner backends')
+parser.add_argument('--sizes', default = '160x120,320x240')
+parser.add_argument('--counts', default = '2,6')
+args = parser.parse_args()
+
+print "kernels %s" % ("compiled by numba " + Kernels.numba.__version__ if Kernels.AVAILABLE else "uncompiled (numba not installed)")
+status = 0
+for size in args.sizes.split(','):
+	width, height = [ int(v) for v in size.split('x') ]
+	for count in [ int(v) for v in args.counts.split(',') ]:
+		codes = randomCodes(width, height, count, minDiameter = 24, maxDiameter = 90, seed = width * count)
+		image = renderScene(width, height, codes, blur = 0.7, gradient = 60, angle = 0.4, noise = 6, seed = count)
+		for runTables in (False, True):
+			bw, found = scan(image, 'numpy', runTables)
+			jbw, jfound = scan(image, 'jit', runTables)
+			diffs = compareKernels(image, runTables)
+			ok = (bw == jbw).all() and found == jfound and diffs == 0
+			print "%-10s %3d codes  run tables %-5s  %s" % (size, len(found), runTables, "ok" if ok else "DIFFERENT (%d kernel mismatches)" % diffs)
+			sys.stdout.flush()
+			if not ok:
+				status = 1
+
+sys.exit(status)
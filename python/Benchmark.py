@@ -0,0 +1,127 @@
+'''
+Times each stage of the scanner (getIntensity, threshold,
+markCandidates, findCodes, decode and the whole scan) on synthetic
+frames (see Render.py) across resolutions and code counts, and checks
+that every code drawn is found.
+
+Results can be appended to a file (one JSON record per run) and
+compared against the last record in a file.  A stage that got slower
+than the tolerance allows, or a frame where fewer codes were found,
+is reported as a regression and the script exits with status 1.
+
+usage: python Benchmark.py [--sizes 640x480,1920x1080] [--counts 4,32]
+                           [--repeat 5] [--record FILE] [--compare FILE]
+                           [--tolerance 0.25] [--label TEXT]
+                           [--backend auto|jit|numpy]
+'''
+import sys
+import json
+import time
+import argparse
+from Scanner import Scanner
+from TopCode import TopCode
+from Render import randomCodes, renderScene
+
+
+STAGES = ('getIntensity', 'threshold', 'markCandidates', 'findCodes', 'decode', 'scan')
+
+
+'''
+Returns the shortest of repeat runs of fn, in milliseconds.  setup
+(optional) runs untimed before each run.
+'''
+def best(fn, repeat, setup = None):
+	times = []
+	for i in xrange(repeat):
+		if setup is not None:
+			setup()
+		start = time.time()
+		fn()
+		times.append(time.time() - start)
+	return min(times) * 1000.0
+
+
+'''
+Times every stage on one synthetic frame and returns the times (ms)
+with the number of codes drawn and found.
+'''
+def benchmark(width, height, count, repeat, backend):
+	codes = randomCodes(width, height, count, seed = width * count)
+	image = renderScene(width, height, codes, blur = 0.7, gradient = 60, angle = 0.3, noise = 6, seed = count)
+	s = Scanner()
+	s.setBackend(backend)
+	s.warmup()
+	s.load(image)
+	s.markCandidates()
+
+	def reload():
+		s.intensity = s.getIntensity(image)
+
+	def decodeAll():
+		for top in codes:
+			TopCode().decode(s, int(round(top.x)), int(round(top.y)))
+
+	result = {}
+	result['getIntensity'] = best(reload, repeat)
+	result['threshold'] = best(s.threshold, repeat, reload)
+	result['markCandidates'] = best(s.markCandidates, repeat)
+	result['findCodes'] = best(s.findCodes, repeat)
+	result['decode'] = best(decodeAll, repeat)
+	result['scan'] = best(lambda: s.scan(image = image), repeat)
+
+	found = set([ (c.code, int(round(c.x)), int(round(c.y))) for c in s.scan(image = image) ])
+	hits = 0
+	for top in codes:
+		hits += any([ code == top.code and abs(x - top.x) <= 2 and abs(y - top.y) <= 2 for (code, x, y) in found ])
+	result['codes'] = len(codes)
+	result['found'] = hits
+	return result
+
+
+parser = argparse.ArgumentParser(description = 'Per-stage TopCode scanner benchmark')
+parser.add_argument('--sizes', default = '640x480,1280x720,1920x1080')
+parser.add_argument('--counts', default = '4,16,48')
+parser.add_argument('--repeat', type = int, default = 5)
+parser.add_argument('--record', help = 'append the results to this file')
+parser.add_argument('--compare', help = 'compare with the last results in this file')
+parser.add_argument('--tolerance', type = float, default = 0.25, help = 'allowed slowdown (0.25 = 25%%)')
+parser.add_argument('--label', default = '')
+parser.add_argument('--backend', default = 'auto', choices = Scanner.BACKENDS)
+args = parser.parse_args()
+
+results = {}
+print "%-16s" % "frame" + "".join([ "%15s" % stage for stage in STAGES ]) + "    found"
+for size in args.sizes.split(','):
+	width, height = [ int(v) for v in size.split('x') ]
+	for count in [ int(v) for v in args.counts.split(',') ]:
+		key = "%dx%d/%d" % (width, height, count)
+		r = results[key] = benchmark(width, height, count, args.repeat, args.backend)
+		print "%-16s" % key + "".join([ "%12.2f ms" % r[stage] for stage in STAGES ]) + "  %3d/%d" % (r['found'], r['codes'])
+		sys.stdout.flush()
+
+status = 0
+if args.compare:
+	with open(args.compare) as f:
+		lines = [ line for line in f if line.strip() ]
+	if lines:
+		last = json.loads(lines[-1])
+		print "\ncompared with %s %s" % (time.ctime(last['time']), last.get('label', ''))
+		for key in sorted(results):
+			if key not in last['results']:
+				continue
+			old, new = last['results'][key], results[key]
+			for stage in STAGES:
+				if (new[stage] > old[stage] * (1 + args.tolerance) and new[stage] - old[stage] > 0.5):
+					print "REGRESSION %-16s %-15s %8.2f ms -> %8.2f ms" % (key, stage, old[stage], new[stage])
+					status = 1
+			if (new['found'] < old['found']):
+				print "REGRESSION %-16s found %d of %d codes, was %d" % (key, new['found'], new['codes'], old['found'])
+				status = 1
+		if status == 0:
+			print "no regressions"
+
+if args.record:
+	with open(args.record, 'a') as f:
+		f.write(json.dumps({ 'time': time.time(), 'label': args.label, 'results': results }, sort_keys = True) + "\n")
+
+sys.exit(status)
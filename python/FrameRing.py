@@ -0,0 +1,215 @@
+'''
+ * @(#) FrameRing.py
+ *
+ * Tangible Object Placement Codes (TopCodes)
+ * Copyright (c) 2026 The topcode-python contributors
+ *
+ * This program is free software you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License (version 2) as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful, but
+ * WITHOUT ANY WARRANTY without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program if not, write to the Free Software
+ * Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+'''
+
+import multiprocessing
+import numpy as np
+from Scanner import Scanner
+from TopCode import TopCode
+
+'''
+ * Ring of fixed-size frame slots in shared memory.  Every process that
+ * shares the ring (worker processes get it when they are started) sees
+ * a slot as a numpy array over the same memory, so frames written by
+ * one process are read by the others without being copied or pickled.
+ *
+ * @author The topcode-python contributors
+'''
+
+class FrameRing(object):
+
+
+	'''
+	Create a ring of the given number of slots, each holding one frame
+	of the given shape and type.
+	'''
+	def __init__(self, slots, shape, dtype = np.uint8):
+		''' Number of frame slots '''
+		self.slots = slots
+
+		''' Shape and type of a frame '''
+		self.shape = tuple(shape)
+		self.dtype = np.dtype(dtype)
+
+		''' Number of values in a frame '''
+		self.count = int(np.prod(self.shape))
+
+		''' Shared memory behind every slot '''
+		self.buffer = multiprocessing.RawArray('b', slots * self.count * self.dtype.itemsize)
+
+
+	'''
+	Returns the frame in the given slot as a numpy array over the
+	shared memory (not a copy).
+	'''
+	def view(self, slot):
+		offset = slot * self.count * self.dtype.itemsize
+		return np.frombuffer(self.buffer, self.dtype, self.count, offset).reshape(self.shape)
+
+
+	'''
+	Copies a frame into the given slot.
+	'''
+	def write(self, slot, image):
+		if (image.shape != self.shape):
+			raise ValueError("Frame shape " + str(image.shape) + " doesn't fit slots of " + str(self.shape))
+		self.view(slot)[...] = image
+
+
+
+'''
+ * Pool of scanner processes fed through a FrameRing.  Frames are copied
+ * into free slots of the ring and only the slot number goes to the
+ * workers; only the codes found (code, x, y, unit, orientation and
+ * confidence of each) come back.  The number of slots bounds the
+ * frames in flight.
+ *
+ * @author The topcode-python contributors
+'''
+
+class RingPool(object):
+
+
+	'''
+	Create a pool for frames of the given shape and type.  The scanner
+	(optional) gives the settings used by every worker.  slots defaults
+	to two per worker.
+	'''
+	def __init__(self, shape, workers = None, slots = None, scanner = None, dtype = np.uint8):
+		if workers is None:
+			workers = multiprocessing.cpu_count()
+		if slots is None:
+			slots = 2 * workers
+
+		''' Shared frame slots '''
+		self.ring = FrameRing(slots, shape, dtype)
+
+		''' Slots waiting for a frame '''
+		self.free = range(slots)
+
+		''' (index, slot) of frames to scan; None stops a worker '''
+		self.tasks = multiprocessing.Queue()
+
+		''' (index, slot, records or error) of scanned frames '''
+		self.done = multiprocessing.Queue()
+
+		''' Number of frames handed to the workers and not collected yet '''
+		self.waiting = 0
+
+		settings = (scanner if scanner is not None else Scanner()).getSettings()
+		self.workers = [ multiprocessing.Process(target=ringWorker, args=(self.ring, settings, self.tasks, self.done)) for i in xrange(workers) ]
+		for worker in self.workers:
+			worker.daemon = True
+			worker.start()
+
+
+	'''
+	Generator that scans a sequence of frames and yields (index, codes)
+	for every frame in input order.  Frames still in flight when the
+	generator is closed early (or a scan fails) are waited for and
+	their results thrown away, so the next scan() starts clean.
+	'''
+	def scan(self, frames):
+		self.drain()
+		results = {}
+		expect = 0
+		try:
+			for index, image in enumerate(frames):
+				while not self.free:
+					self.collect(results)
+					while expect in results:
+						yield expect, results.pop(expect)
+						expect += 1
+
+				slot = self.free.pop()
+				self.ring.write(slot, image)
+				self.tasks.put((index, slot))
+				self.waiting += 1
+
+			while self.waiting > 0:
+				self.collect(results)
+				while expect in results:
+					yield expect, results.pop(expect)
+					expect += 1
+		finally:
+			self.drain()
+
+
+	'''
+	Waits for one scanned frame, frees its slot and files its codes
+	by frame index.
+	'''
+	def collect(self, results):
+		index, slot, records = self.done.get()
+		self.waiting -= 1
+		self.free.append(slot)
+		if isinstance(records, basestring):
+			raise RuntimeError("Scan of frame " + str(index) + " failed: " + records)
+
+		codes = []
+		for code, x, y, unit, orientation, confidence in records:
+			top = TopCode(code)
+			top.setLocation(x, y)
+			top.unit = unit
+			top.setOrientation(orientation)
+			top.confidence = confidence
+			codes.append(top)
+		results[index] = codes
+
+
+	'''
+	Waits for every frame still in flight and frees its slot, dropping
+	its result.
+	'''
+	def drain(self):
+		while self.waiting > 0:
+			index, slot, records = self.done.get()
+			self.waiting -= 1
+			self.free.append(slot)
+
+
+	'''
+	Stops the worker processes.
+	'''
+	def close(self):
+		for worker in self.workers:
+			self.tasks.put(None)
+		for worker in self.workers:
+			worker.join()
+		self.workers = []
+
+
+'''
+Worker process of a RingPool: scans frames straight out of the ring
+and sends back one small record per code found.
+'''
+def ringWorker(ring, settings, tasks, done):
+	scanner = Scanner()
+	scanner.setSettings(settings)
+	scanner.warmup()
+	while True:
+		job = tasks.get()
+		if job is None:
+			return
+		index, slot = job
+		try:
+			codes = scanner.scan(image=ring.view(slot))
+			done.put((index, slot, [ (c.code, c.x, c.y, c.unit, c.orientation, c.confidence) for c in codes ]))
+		except Exception as e:
+			done.put((index, slot, repr(e)))
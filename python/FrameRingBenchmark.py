@@ -0,0 +1,46 @@
+'''
+Compares scanning a stream of frames with plain multiprocessing (frames
+pickled to the workers, see Scanner.scanMany) against a RingPool (frames
+shared through a FrameRing).
+
+usage: python FrameRingBenchmark.py [width height frames workers]
+'''
+import sys
+import time
+import multiprocessing
+import numpy as np
+from Scanner import Scanner
+from FrameRing import RingPool
+
+
+width, height, count, workers = 1920, 1080, 120, multiprocessing.cpu_count()
+if len(sys.argv) > 4:
+	width, height, count, workers = [ int(a) for a in sys.argv[1:5] ]
+
+# A handful of distinct noisy frames, reused round robin
+rng = np.random.RandomState(0)
+frames = [ rng.randint(0, 256, (height, width, 3)).astype(np.uint8) for i in xrange(4) ]
+stream = lambda: (frames[i % len(frames)] for i in xrange(count))
+
+print "%d frames of %dx%d, %d workers" % (count, width, height, workers)
+
+scanner = Scanner()
+start = time.time()
+for image in stream():
+	scanner.scan(image = image)
+serial = time.time() - start
+print "serial scan()      %6.2f s  %6.1f frames/s" % (serial, count / serial)
+
+start = time.time()
+for index, codes in scanner.scanMany(stream(), workers = workers):
+	pass
+pickled = time.time() - start
+print "pickled frames     %6.2f s  %6.1f frames/s" % (pickled, count / pickled)
+
+pool = RingPool(frames[0].shape, workers = workers)
+start = time.time()
+for index, codes in pool.scan(stream()):
+	pass
+shared = time.time() - start
+pool.close()
+print "shared frame ring  %6.2f s  %6.1f frames/s" % (shared, count / shared)
@@ -0,0 +1,240 @@
+'''
+ * @(#) Kernels.py
+ *
+ * Tangible Object Placement Codes (TopCodes)
+ * Copyright (c) 2026 The topcode-python contributors
+ *
+ * This program is free software you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License (version 2) as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful, but
+ * WITHOUT ANY WARRANTY without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program if not, write to the Free Software
+ * Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+'''
+
+import numpy as np
+
+try:
+	import numba
+except ImportError:
+	numba = None
+
+'''
+ * Compiled versions of the scanner's tight integer loops, used by the
+ * 'jit' backend (see Scanner.setBackend) when numba is installed.
+ * Every kernel gives exactly the same result as the code it replaces:
+ *
+ *	 wellner   - Scanner.thresholdPython / thresholdNumpy
+ *	 walk      - the pixel walks of Scanner.xdist and Scanner.ydist
+ *	 readUnit  - TopCode.readUnit without run tables
+ *	 readCodes - TopCode.readCodes
+ *
+ * The kernels are plain functions written in the subset of Python
+ * that numba compiles, so without numba they still run (slowly) as
+ * they are.  Compiled kernels are cached on disk; warmup() compiles or
+ * loads them up front so the first frame doesn't pay for it.
+ *
+ * @author The topcode-python contributors
+'''
+
+''' True if numba is installed and the kernels are compiled '''
+AVAILABLE = numba is not None
+
+
+'''
+Compiles fn with numba (in nopython mode, cached on disk) if it's
+installed, or else returns it as is.
+'''
+def jit(fn):
+	if numba is None:
+		return fn
+	return numba.njit(cache = True, nogil = True)(fn)
+
+
+'''
+Wellner adaptive threshold of the intensity plane (int32) into bw
+(uint8, 0 or 1), visiting rows back and forth.  sums is scratch space
+for one row of running sums.
+'''
+@jit
+def wellner(intensity, bw, sums):
+	h, w = intensity.shape
+	s = 30
+	sum = 128
+	for j in range(h):
+		for k in range(w):
+			x = k if (j % 2 == 0) else (w - 1 - k)
+			a = intensity[j, x]
+			sum += a - (sum // s)
+			if (j > 0):
+				threshold = (sum + sums[x]) // (2 * s)
+			else:
+				threshold = sum // s
+			sums[x] = sum
+
+			# a >= threshold * 0.975, in integers
+			bw[j, x] = 1 if (a * 40 >= threshold * 39) else 0
+
+
+'''
+Majority (0 or 1) of the 3x3 region at (x, y) from the counts plane,
+or 0 along the edges (see Scanner.getBW3x3).
+'''
+@jit
+def bw3x3(counts, x, y):
+	h, w = counts.shape
+	if (x < 1 or x > (w - 2) or y < 1 or y >= (h - 2)):
+		return 0
+	return 1 if (counts[y, x] >= 5) else 0
+
+
+'''
+Counts the pixels from (x, y) in steps of (dx, dy), one of them zero,
+until the 3x3 majority changes color, or returns -1 if it doesn't
+before the edge it is heading for (see Scanner.xdist and
+Scanner.ydist).
+'''
+@jit
+def walk(counts, x, y, dx, dy):
+	h, w = counts.shape
+	start = bw3x3(counts, x, y)
+	i = x + dx
+	j = y + dy
+	n = 1
+	while ((dx == 0 or (i > 1 and i < w - 1)) and (dy == 0 or (j > 1 and j < h - 1))):
+		if (start + bw3x3(counts, i, j) == 1):
+			return n * (abs(dx) + abs(dy))
+		i += dx
+		j += dy
+		n += 1
+	return -1
+
+
+'''
+Width of a single ring of the bulls-eye centered at (sx, sy), from the
+distance out to the black ring in the four directions, or -1 (see
+TopCode.readUnit).
+'''
+@jit
+def readUnit(counts, sx, sy):
+	h, w = counts.shape
+	whiteL = whiteR = whiteU = whiteD = True
+	distL = distR = distU = distD = 0
+	i = 1
+	while True:
+		if (sx - i < 1 or sx + i >= w - 1 or sy - i < 1 or sy + i >= h - 1 or i > 100):
+			return -1.0
+
+		sample = bw3x3(counts, sx - i, sy)
+		if (distL <= 0):
+			if (whiteL and sample == 0):
+				whiteL = False
+			elif (not whiteL and sample == 1):
+				distL = i
+
+		sample = bw3x3(counts, sx + i, sy)
+		if (distR <= 0):
+			if (whiteR and sample == 0):
+				whiteR = False
+			elif (not whiteR and sample == 1):
+				distR = i
+
+		sample = bw3x3(counts, sx, sy - i)
+		if (distU <= 0):
+			if (whiteU and sample == 0):
+				whiteU = False
+			elif (not whiteU and sample == 1):
+				distU = i
+
+		sample = bw3x3(counts, sx, sy + i)
+		if (distD <= 0):
+			if (whiteD and sample == 0):
+				whiteD = False
+			elif (not whiteD and sample == 1):
+				distD = i
+
+		if (distR > 0 and distL > 0 and distU > 0 and distD > 0):
+			u = (distR + distL + distU + distD) / 8.0
+			if (abs(distR + distL - distU - distD) > u):
+				return -1.0
+			return u
+		i += 1
+
+
+'''
+Reads every (unit, arc step) hypothesis of the code centered at (x, y)
+from the counts plane, turned into 3x3 averages by levels (see
+Scanner.SAMPLE_3x3): sector directions dx and dy (one row per
+hypothesis), ring distances rings (in units) and the checksum table.
+Fills in conf (zero where the reading fails), bits and intact (the
+number of sectors showing the bulls-eye rings), one per hypothesis
+(see TopCode.readCodes).
+'''
+@jit
+def readCodes(counts, levels, x, y, units, dx, dy, rings, checksum, conf, bits, intact):
+	h, w = counts.shape
+	core = np.empty(rings.shape[0], np.int64)
+	for k in range(units.shape[0]):
+		ok = True
+		c = 0
+		b = 0
+		n = 0
+		for sector in range(dx.shape[1]):
+			for i in range(rings.shape[0]):
+				dist = rings[i] * units[k]
+				vx = x + dx[k, sector] * dist
+				vy = y + dy[k, sector] * dist
+
+				# round half away from zero, like the builtin round()
+				if (vx >= 0):
+					sx = int(np.floor(vx)) + (1 if (vx - np.floor(vx) >= 0.5) else 0)
+				else:
+					sx = int(np.ceil(vx)) - (1 if (np.ceil(vx) - vx >= 0.5) else 0)
+				if (vy >= 0):
+					sy = int(np.floor(vy)) + (1 if (vy - np.floor(vy) >= 0.5) else 0)
+				else:
+					sy = int(np.ceil(vy)) - (1 if (np.ceil(vy) - vy >= 0.5) else 0)
+
+				if (sx < 1 or sx > (w - 2) or sy < 1 or sy >= (h - 2)):
+					core[i] = 0
+				else:
+					core[i] = levels[counts[sy, sx]]
+
+			# white rings and black ring
+			if (core[1] <= 128 or core[3] <= 128 or core[4] <= 128 or core[6] <= 128 or
+				core[2] > 128 or core[5] > 128):
+				ok = False
+			else:
+				n += 1
+
+			# confidence in core, data ring and opposite data ring samples
+			c += (core[1] + core[3] + core[4] + core[6] + (0xff - core[2]) + (0xff - core[5]) +
+				  abs(core[7] * 2 - 0xff) + (0xff - abs(core[0] * 2 - 0xff)))
+
+			if (core[7] > 128):
+				b |= (1 << sector)
+
+		bits[k] = b
+		intact[k] = n
+		conf[k] = c if (ok and checksum[b]) else 0
+
+
+'''
+Runs every kernel once on a small frame, so they are compiled (or
+loaded from the cache) before the first real one.
+'''
+def warmup():
+	intensity = np.zeros((16, 16), np.int32)
+	bw = np.zeros((16, 16), np.uint8)
+	wellner(intensity, bw, np.zeros(16, np.int32))
+	walk(bw, 8, 8, 1, 0)
+	readUnit(bw, 8, 8)
+	dx = np.ones((1, 13))
+	readCodes(bw, np.zeros(10, np.uint8), 8.0, 8.0, np.ones(1), dx, dx, np.arange(0, 8) - 3.5,
+			  np.zeros(1 << 13, bool), np.zeros(1, np.int64), np.zeros(1, np.int64), np.zeros(1, np.int64))
@@ -0,0 +1,100 @@
+'''
+Reports the memory a Scanner uses per frame on synthetic frames (see
+Render.py) of several sizes:
+
+ steady - bytes of the numpy planes the scanner holds between frames
+          (its buffers and result planes, not the caller's image)
+ peak   - growth of the process's peak resident memory while scanning
+          one frame, over its resident memory before (Linux only)
+ new    - bytes of buffers allocated by the frame (zero once the
+          scanner has seen a frame of the same size)
+
+Every size is scanned twice so the second frame shows the steady state,
+once at full resolution and once in pyramid mode (see
+Scanner.setPyramid), which also counts the pyramid's helper scanners.
+Exits with status 1 if the scanner holds more than --limit bytes per
+pixel between frames at full resolution, or if the second frame of a
+size allocates any buffer in either mode.  The planes a pyramid scan
+keeps grow with the windows around its codes rather than with the
+frame, so only their reuse is checked.
+
+usage: python MemoryCheck.py [--sizes 640x480,1280x720,1920x1080] [--limit 3.0]
+'''
+import sys
+import argparse
+import numpy as np
+from Scanner import Scanner
+from Render import randomCodes, renderScene
+
+
+'''
+Returns the bytes of the numpy arrays held by the scanner and its
+helpers, counting memory shared by several views once and leaving out
+the image.
+'''
+def held(scanner, seen = None):
+	if seen is None:
+		seen = {}
+	arrays = [ v for v in scanner.__dict__.values() if isinstance(v, np.ndarray) ] + scanner.buffers.values()
+	for a in arrays:
+		while isinstance(a.base, np.ndarray):
+			a = a.base
+		if a is not scanner.image:
+			seen[id(a)] = a.nbytes
+	for helper in scanner.helpers.values():
+		held(helper, seen)
+	return sum(seen.values())
+
+
+'''
+Returns the process's resident and peak resident memory in bytes,
+resetting the peak first so it can be read again.  Returns None where
+/proc doesn't give them.
+'''
+def resident(reset = False):
+	try:
+		if reset:
+			with open('/proc/self/clear_refs', 'w') as f:
+				f.write('5')
+		rss = hwm = None
+		with open('/proc/self/status') as f:
+			for line in f:
+				if line.startswith('VmRSS:'):
+					rss = int(line.split()[1]) * 1024
+				elif line.startswith('VmHWM:'):
+					hwm = int(line.split()[1]) * 1024
+		return rss, hwm
+	except (IOError, OSError, ValueError):
+		return None
+
+
+parser = argparse.ArgumentParser(description = 'Per-frame memory of the TopCode scanner')
+parser.add_argument('--sizes', default = '640x480,1280x720,1920x1080')
+parser.add_argument('--limit', type = float, default = 3.0, help = 'most bytes per pixel held between frames')
+args = parser.parse_args()
+
+status = 0
+print "%-12s %-8s %6s %14s %14s %14s" % ("frame", "mode", "pass", "steady B/px", "peak B/px", "new B/px")
+for mode in ('full', 'pyramid'):
+	scanner = Scanner()
+	scanner.setStats(True)
+	scanner.setPyramid(mode == 'pyramid')
+	scanner.setMinCodeDiameter(48)
+	scanner.setMaxCodeDiameter(128)
+	for size in args.sizes.split(','):
+		width, height = [ int(v) for v in size.split('x') ]
+		pixels = float(width * height)
+		image = renderScene(width, height, randomCodes(width, height, 16, minDiameter = 48, seed = width), blur = 0.7, noise = 4, seed = 1)
+		for run in (1, 2):
+			before = resident(True)
+			scanner.scan(image = image)
+			after = resident()
+			peak = "%14.2f" % ((after[1] - before[0]) / pixels) if (before and after) else "%14s" % "n/a"
+			steady = held(scanner) / pixels
+			new = scanner.getStats().allocated / pixels
+			print "%-12s %-8s %6d %14.2f %s %14.2f" % (size, mode, run, steady, peak, new)
+			if ((mode == 'full' and steady > args.limit) or (run == 2 and new > 0)):
+				status = 1
+
+print "ok" if status == 0 else "FAILED: over %.1f bytes per pixel held, or buffers reallocated" % args.limit
+sys.exit(status)
@@ -0,0 +1,286 @@
+'''
+ * @(#) Pipeline.py
+ *
+ * Tangible Object Placement Codes (TopCodes)
+ * Copyright (c) 2026 The topcode-python contributors
+ *
+ * This program is free software you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License (version 2) as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful, but
+ * WITHOUT ANY WARRANTY without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program if not, write to the Free Software
+ * Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+'''
+
+import collections
+import threading
+import time
+from Scanner import Scanner
+
+'''
+ * Live capture and scan pipeline for cameras.  A capture thread reads
+ * frames as fast as the camera delivers them into a single slot that
+ * always holds the latest frame; a frame that wasn't picked up before
+ * the next one arrived is dropped instead of queued.  Scan worker
+ * threads (each with its own Scanner) take the latest frame, scan it
+ * and hand back a ScanResult, either to a callback or through the
+ * results() iterator.  Results older than one already delivered are
+ * dropped too, so what comes out is always fresh and the delay stays
+ * bounded no matter how slow scanning is.
+ *
+ * @author The topcode-python contributors
+'''
+
+class Pipeline(object):
+
+
+	'''
+	Create a pipeline.  capture is anything with a read() method that
+	returns (ok, image), like cv2.VideoCapture.  The scanner (optional)
+	gives the settings used by every worker.  callback (optional) is
+	called from a worker thread with each ScanResult; calls never
+	overlap and come in frame order, since a worker that finished an
+	older frame after a newer one was delivered drops it.  Without a
+	callback, results are kept (up to backlog of them) for results().
+	'''
+	def __init__(self, capture, workers = 2, scanner = None, callback = None, backlog = 4):
+		''' Frame source '''
+		self.capture = capture
+
+		''' Number of scan worker threads '''
+		self.workers = max(1, workers)
+
+		''' Settings for the workers' scanners '''
+		self.settings = (scanner if scanner is not None else Scanner()).getSettings()
+
+		''' Called with every ScanResult, or None '''
+		self.callback = callback
+
+		''' Results not yet taken by results(), oldest first '''
+		self.pending = collections.deque(maxlen = max(1, backlog))
+
+		''' Latest captured frame not yet scanned: (index, time, image) or None '''
+		self.frame = None
+
+		''' Index of the newest result delivered so far '''
+		self.last = -1
+
+		''' Guards the frame slot, the results and the counters '''
+		self.lock = threading.Condition()
+
+		''' Held while the callback runs, so calls go out one at a time
+		and in order '''
+		self.delivery = threading.Lock()
+
+		''' Worker and capture threads '''
+		self.threads = []
+
+		self.running = False
+
+		''' Number of scan workers that haven't exited yet '''
+		self.active = 0
+
+		''' Number of frames captured, dropped unscanned and scanned '''
+		self.captured = 0
+		self.dropped = 0
+		self.scanned = 0
+
+		''' Number of results dropped because a newer one was already out,
+		or because the backlog was full '''
+		self.stale = 0
+
+
+	'''
+	Starts the capture thread and the scan workers.  The jit kernels
+	(if used) are compiled first, before any frame is captured.
+	'''
+	def start(self):
+		if self.running:
+			return
+		scanner = Scanner()
+		scanner.setSettings(self.settings)
+		scanner.warmup()
+		self.running = True
+		self.active = self.workers
+		self.threads = [ threading.Thread(target=self.captureLoop) ]
+		self.threads += [ threading.Thread(target=self.scanLoop) for i in xrange(self.workers) ]
+		for thread in self.threads:
+			thread.daemon = True
+			thread.start()
+
+
+	'''
+	Stops the pipeline and waits for its threads to finish.  The scan
+	in progress on each worker is finished (and delivered) first.
+	'''
+	def stop(self):
+		with self.lock:
+			self.running = False
+			self.lock.notify_all()
+		for thread in self.threads:
+			if thread is not threading.current_thread():
+				thread.join()
+
+
+	'''
+	Returns True while the pipeline is running.  It stops by itself
+	when the capture runs out of frames.
+	'''
+	def isRunning(self):
+		return self.running
+
+
+	'''
+	Generator of ScanResults, newest frames only, until the pipeline
+	stops and every worker has delivered its last scan.  Waits up to
+	timeout seconds for each result (forever if None) and ends if none
+	came.
+	'''
+	def results(self, timeout = None):
+		while True:
+			with self.lock:
+				deadline = None if timeout is None else time.time() + timeout
+				while not self.pending and (self.running or self.active > 0):
+					wait = None if deadline is None else deadline - time.time()
+					if wait is not None and wait <= 0:
+						break
+					self.lock.wait(wait)
+				if not self.pending:
+					return
+				result = self.pending.popleft()
+			yield result
+
+
+	'''
+	Reads frames into the slot, replacing (dropping) any frame the
+	workers haven't taken yet.
+	'''
+	def captureLoop(self):
+		index = 0
+		while self.running:
+			ok, image = self.capture.read()
+			stamp = time.time()
+			with self.lock:
+				if not ok or image is None:
+					self.running = False
+					self.lock.notify_all()
+					return
+				if self.frame is not None:
+					self.dropped += 1
+				self.frame = (index, stamp, image)
+				self.captured += 1
+				self.lock.notify_all()
+			index += 1
+
+
+	'''
+	Takes the latest frame, scans it and delivers the result.
+	'''
+	def scanLoop(self):
+		try:
+			self.scanFrames()
+		finally:
+			with self.lock:
+				self.active -= 1
+				self.lock.notify_all()
+
+
+	'''
+	Body of scanLoop: scans frames until the pipeline stops and no
+	frame is left.
+	'''
+	def scanFrames(self):
+		scanner = Scanner()
+		scanner.setSettings(self.settings)
+		while True:
+			with self.lock:
+				while self.frame is None and self.running:
+					self.lock.wait()
+				if self.frame is None:
+					return
+				index, stamp, image = self.frame
+				self.frame = None
+
+			start = time.time()
+			codes = scanner.scan(image=image)
+			result = ScanResult(index, image, codes, stamp, start, time.time())
+
+			if self.callback is not None:
+				self.deliver(result)
+				continue
+
+			with self.lock:
+				self.scanned += 1
+				if index < self.last:
+					self.stale += 1
+					continue
+				self.last = index
+				if len(self.pending) == self.pending.maxlen:
+					self.stale += 1
+				self.pending.append(result)
+				self.lock.notify_all()
+
+
+	'''
+	Passes a result to the callback, unless a newer one was already
+	passed.  The check and the call happen under the delivery lock, so
+	a worker can't deliver an older frame after a newer one.
+	'''
+	def deliver(self, result):
+		with self.delivery:
+			with self.lock:
+				self.scanned += 1
+				if result.index < self.last:
+					self.stale += 1
+					return
+				self.last = result.index
+			self.callback(result)
+
+
+'''
+ * The TopCodes found in one captured frame, stamped with when the
+ * frame was captured, when its scan started and when it finished (all
+ * from time.time()).
+'''
+
+class ScanResult(object):
+
+
+	def __init__(self, index, image, codes, captured, started, finished):
+		''' Frame number, counting every captured frame '''
+		self.index = index
+
+		''' The captured frame '''
+		self.image = image
+
+		''' TopCodes found in the frame '''
+		self.codes = codes
+
+		''' Time the frame was captured '''
+		self.captured = captured
+
+		''' Time the scan started '''
+		self.started = started
+
+		''' Time the scan finished '''
+		self.finished = finished
+
+
+	'''
+	Returns the time spent scanning the frame, in seconds.
+	'''
+	def getScanTime(self):
+		return self.finished - self.started
+
+
+	'''
+	Returns the time from capture to the end of the scan, in seconds.
+	'''
+	def getLatency(self):
+		return self.finished - self.captured
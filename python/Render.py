@@ -0,0 +1,93 @@
+'''
+ * @(#) Render.py
+ *
+ * Tangible Object Placement Codes (TopCodes)
+ * Copyright (c) 2026 The topcode-python contributors
+ *
+ * This program is free software you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License (version 2) as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful, but
+ * WITHOUT ANY WARRANTY without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program if not, write to the Free Software
+ * Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+'''
+
+import math
+import cv2
+import numpy as np
+from TopCode import TopCode
+
+'''
+ * Synthetic camera frames of TopCodes for testing and benchmarking.
+ * Codes are drawn with TopCode.draw onto a flat background, then the
+ * frame is blurred (like a lens out of focus), lit unevenly (a linear
+ * lighting gradient) and given sensor noise.
+ *
+ * @author The topcode-python contributors
+'''
+
+
+'''
+Returns count TopCodes picked at random (from generateCodes) with
+random orientations and diameters between minDiameter and maxDiameter,
+placed at random inside a width x height frame without touching each
+other.  Fewer codes are returned if they don't fit.
+'''
+def randomCodes(width, height, count, minDiameter = 40, maxDiameter = 120, seed = None):
+	rng = np.random.RandomState(seed)
+	choices = TopCode().generateCodes()
+	codes = []
+	for attempt in xrange(count * 50):
+		if (len(codes) >= count):
+			break
+		d = rng.uniform(minDiameter, maxDiameter)
+		r = d / 2.0 + 2
+		if (width <= 2 * r or height <= 2 * r):
+			continue
+		x, y = rng.uniform(r, width - r), rng.uniform(r, height - r)
+		if any([ math.hypot(x - c.x, y - c.y) < r + c.getDiameter() / 2.0 + 2 for c in codes ]):
+			continue
+
+		top = TopCode(choices[rng.randint(len(choices))].code)
+		top.setLocation(x, y)
+		top.setDiameter(d)
+		top.setOrientation(rng.uniform(-math.pi, math.pi))
+		codes.append(top)
+	return codes
+
+
+'''
+Renders the given TopCodes into a width x height BGR frame.
+
+background - gray level (0-255) behind the codes
+blur       - standard deviation of a Gaussian blur, in pixels
+gradient   - change in brightness (gray levels) from one side of the
+             frame to the other, along angle (radians)
+noise      - standard deviation of Gaussian noise, in gray levels
+'''
+def renderScene(width, height, codes, background = 200, blur = 0.0, gradient = 0.0, angle = 0.0, noise = 0.0, seed = None):
+	img = np.empty((height, width), np.float32)
+	img.fill(background)
+	for top in codes:
+		top.draw(img)
+
+	if (blur > 0):
+		img = cv2.GaussianBlur(img, (0, 0), blur)
+
+	if (gradient != 0):
+		ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+		ramp = (xs - width / 2.0) * math.cos(angle) + (ys - height / 2.0) * math.sin(angle)
+		span = abs(width * math.cos(angle)) + abs(height * math.sin(angle))
+		img += ramp * (gradient / max(span, 1.0))
+
+	if (noise > 0):
+		img += np.random.RandomState(seed).normal(0, noise, img.shape).astype(np.float32)
+
+	img = np.clip(np.round(img), 0, 0xff).astype(np.uint8)
+	return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
@@ -0,0 +1,100 @@
+'''
+ * @(#) ScanStats.py
+ *
+ * Tangible Object Placement Codes (TopCodes)
+ * Copyright (c) 2026 The topcode-python contributors
+ *
+ * This program is free software you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License (version 2) as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful, but
+ * WITHOUT ANY WARRANTY without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program if not, write to the Free Software
+ * Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+'''
+
+import time
+
+'''
+ * Statistics of one scan (see Scanner.setStats): wall time spent in
+ * each stage, and how many candidates, decodes and readCode
+ * hypotheses the frame cost.
+ *
+ * Stages of a full-frame scan are 'read' (loading the file, if any),
+ * 'intensity', 'threshold', 'candidates' (markCandidates) and 'decode'
+ * (findCodes); a pyramid scan has a single 'pyramid' stage.
+ *
+ * @author The topcode-python contributors
+'''
+
+class ScanStats(object):
+
+
+	def __init__(self):
+		''' Seconds spent in each stage, in the order they ran '''
+		self.stages = []
+
+		''' Start of the scan and of the current stage (time.time()) '''
+		self.start = time.time()
+		self.mark = self.start
+
+		''' Seconds the whole scan took '''
+		self.total = 0.0
+
+		''' Candidate pixels marked '''
+		self.candidates = 0
+
+		''' Points tested as code centers '''
+		self.tested = 0
+
+		''' Codes decoded '''
+		self.decoded = 0
+
+		''' Points tested that didn't decode '''
+		self.rejected = 0
+
+		''' (unit, arc) hypotheses read, see TopCode.readCodes '''
+		self.readCodes = 0
+
+		''' Hinted decodes tried, and confirmed without the full search '''
+		self.verified = 0
+		self.verifyHits = 0
+
+		''' Bytes of working buffers allocated during the scan (zero once
+		the scanner has seen a frame of the same size) and held after it '''
+		self.allocated = 0
+		self.buffered = 0
+
+
+	'''
+	Ends the current stage, charging the time since the last one to it.
+	'''
+	def lap(self, stage):
+		now = time.time()
+		self.stages.append((stage, now - self.mark))
+		self.mark = now
+
+
+	'''
+	Returns the seconds spent in the given stage (zero if it didn't
+	run).
+	'''
+	def getTime(self, stage):
+		return sum([ t for (name, t) in self.stages if name == stage ])
+
+
+	'''
+	Returns the statistics as a flat dictionary (times in seconds under
+	'time.<stage>' and 'time.total') for exporting.
+	'''
+	def asDict(self):
+		d = dict([ ('time.' + name, self.getTime(name)) for (name, t) in self.stages ])
+		d['time.total'] = self.total
+		for name in ('candidates', 'tested', 'decoded', 'rejected', 'readCodes', 'verified', 'verifyHits', 'allocated', 'buffered'):
+			d[name] = getattr(self, name)
+		return d
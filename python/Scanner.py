@@ -24,9 +24,15 @@
 '''
 
 import math
+import collections
+import multiprocessing
 import cv2
 import numpy as np
-from TopCode import TopCode
+from TopCode import TopCode, toArray
+from SpotGrid import SpotGrid
+from ScanStats import ScanStats
+import Wellner
+import Kernels
 import time
 
 '''
@@ -42,6 +48,30 @@ import time
 
 class Scanner(object):
 
+	''' Available adaptive threshold engines '''
+	THRESHOLD_ENGINES = ('numpy', 'python')
+
+	''' Available backends for the hot loops (see setBackend) '''
+	BACKENDS = ('auto', 'jit', 'numpy')
+
+	''' Extra points of a candidate blob tried when its centroid fails '''
+	FALLBACK_SEEDS = 3
+
+	''' Fewest pixels per unit a code may have at a pyramid level '''
+	PYRAMID_MIN_UNIT = 3
+
+	''' Fewest pixels across (and down) the image at a pyramid level '''
+	PYRAMID_MIN_SIZE = 5
+
+	''' Fewest rows run through the threshold filter above a band '''
+	BAND_LEAD = 4
+
+	''' 3x3 sample value (0-255) for each count of white pixels (0-9) '''
+	SAMPLE_3x3 = (np.arange(0, 10) * 0xff // 9).astype(np.uint8)
+
+	''' Preview color (BGR) of a pixel by its binary bit | candidate bit << 1:
+	black, white, black candidate (left near black) and white candidate '''
+	PREVIEW_COLORS = np.array([ (0, 0, 0), (0xff, 0xff, 0xff), (2, 0, 0), (0, 0xff, 0) ], np.uint8)
 
 
 	'''
@@ -57,11 +87,43 @@ class Scanner(object):
 	  	''' The original image '''
 	  	self.image = None
 
-	  	''' Holds processed binary pixel data '''
-	  	self.data = None
+	  	''' Pixel intensity (0-255), released once thresholding finishes '''
+	  	self.intensity = None
 
-	  	''' Binary view of the image '''
+	  	''' Binary (thresholded black/white) pixel plane '''
+	  	self.bw = None
+
+	  	''' Candidate bulls-eye pixel mask '''
+	  	self.candidates = None
+
+	  	''' Number of white pixels of the binary plane in each 3x3 region
+	  	(0-9), giving both the 3x3 average (see getSample3x3) and the
+	  	majority (see getBW3x3) '''
+	  	self.counts = None
+
+	  	''' Build run tables of the 3x3 majority during thresholding '''
+	  	self.runTables = False
+
+	  	''' Distance from each pixel of the 3x3 majority to the nearest
+	  	pixel of the other color to its left, right, above and below, or
+	  	-1 if there is none (see buildRunTables) '''
+	  	self.left = None
+	  	self.right = None
+	  	self.up = None
+	  	self.down = None
+
+	  	''' Binary view of the image, drawn on request (see getPreview),
+	  	and the shrink it was drawn at '''
 	  	self.preview = None
+	  	self.previewShrink = 1
+
+	  	''' Working buffers by name, reused while the frame size stays
+	  	the same (see buffer) '''
+	  	self.buffers = {}
+
+	  	''' Scanners used by pyramid scans, by name, kept with their
+	  	buffers from frame to frame (see helper) '''
+	  	self.helpers = {}
 
 	  	''' Candidate code count '''
 	  	self.ccount = 0
@@ -69,50 +131,465 @@ class Scanner(object):
 	  	''' Number of candidates tested '''
 	  	self.tcount = 0
 
+	  	''' Number of hinted decodes tried, and confirmed by verify (see TopCode.decode) '''
+	  	self.vcount = 0
+	  	self.vhits = 0
+
+	  	''' Confidence (a fraction of the highest possible) at which the
+	  	adaptive decode search stops, or None to read the full grid of
+	  	unit and arc adjustments (see TopCode.search) '''
+	  	self.stop = TopCode.STOP_CONFIDENCE
+
+	  	''' Number of (unit, arc) hypotheses read (see TopCode.readCodes) '''
+	  	self.rcount = 0
+
+	  	''' Bytes of working buffers allocated since the image was loaded '''
+	  	self.allocated = 0
+
+	  	''' Gather statistics on every scan (see setStats) '''
+	  	self.collect = False
+
+	  	''' Functions called with the statistics of every scan '''
+	  	self.hooks = []
+
+	  	''' Statistics of the scan in progress, or None when not gathering them '''
+	  	self.timer = None
+
+	  	''' Statistics of the last scan gathered '''
+	  	self.stats = None
+
+	  	''' Largest error in the running sum where a band began (see scanBands) '''
+	  	self.bandGap = 0
+
 	  	''' Maximum width of a TopCode unit in pixels '''
 	  	self.maxu = 80
 
+	  	''' Adaptive threshold engine ('numpy' or 'python') '''
+	  	self.engine = 'numpy'
+
+	  	''' Backend asked for ('auto', 'jit' or 'numpy'), and whether the
+	  	compiled kernels are in use (see setBackend) '''
+	  	self.backend = 'auto'
+	  	self.jit = Kernels.AVAILABLE
+
+	  	''' Minimum width of a TopCode unit in pixels (see setMinCodeDiameter) '''
+	  	self.minu = 0
+
+	  	''' Find candidates on a downsampled image first (see scanPyramid) '''
+	  	self.pyramid = False
+
 
 	'''
 	Scan the given image or file(not both) and return a list of all topcodes found in it.
+	With asArray, the topcodes come back as a numpy structured array
+	instead (see TopCode.toArray).
+	'''
+	def scan(self, image = None, filename = None, asArray = False):
+		self.timer = ScanStats() if (self.collect or self.hooks) else None
+		image = self.openImage(image, filename)
+		if (self.timer is not None):
+			self.timer.lap('read')
+
+		if (self.pyramid and self.getPyramidLevel(image.shape[1], image.shape[0]) > 0):
+			spots = self.scanPyramid(image)
+			if (self.timer is not None):
+				self.timer.lap('pyramid')
+		else:
+			self.load(image)		  # run the adaptive threshold filter
+
+			self.markCandidates()	  # mark candidate bulls-eyes
+			if (self.timer is not None):
+				self.timer.lap('candidates')
+
+			spots = self.findCodes()  # scan for topcodes
+			if (self.timer is not None):
+				self.timer.lap('decode')
+
+		if (self.timer is not None):
+			self.finishStats(spots)
+		return toArray(spots) if asArray else spots
+
+
+	'''
+	Fills in the counts of the scan just finished, keeps its statistics
+	for getStats and passes them to every hook.
+	'''
+	def finishStats(self, spots):
+		stats = self.timer
+		self.timer = None
+		stats.total = time.time() - stats.start
+		stats.candidates = self.ccount
+		stats.tested = self.tcount
+		stats.decoded = len(spots)
+		stats.rejected = max(0, self.tcount - len(spots))
+		stats.readCodes = self.rcount
+		stats.verified = self.vcount
+		stats.verifyHits = self.vhits
+		stats.allocated = self.allocated
+		stats.buffered = sum([ buf.nbytes for scanner in [ self ] + self.helpers.values() for buf in scanner.buffers.values() ])
+		self.stats = stats
+		for hook in list(self.hooks):
+			hook(stats)
+
+
+	'''
+	Turns statistics on or off.  With statistics on, every scan() times
+	its stages and counts its work into a ScanStats (see getStats).
+	Statistics are also gathered whenever a hook is set.
+	'''
+	def setStats(self, enabled):
+		self.collect = enabled
+
+
+	'''
+	Returns the ScanStats of the last scan() run with statistics on, or
+	None.
+	'''
+	def getStats(self):
+		return self.stats
+
+
+	'''
+	Adds a function to call with the ScanStats of every scan(), for
+	exporting them to a metrics system.  Hooks run in the scanning
+	thread, right after the scan.
+	'''
+	def addStatsHook(self, hook):
+		self.hooks.append(hook)
+
+
+	'''
+	Removes a function added with addStatsHook.
+	'''
+	def removeStatsHook(self, hook):
+		self.hooks.remove(hook)
+
+	'''
+	Coarse to fine scan of the given image (see setPyramid).  The image
+	is shrunk by 2 ** level (averaging pixels) and thresholded, and the
+	candidate blobs are read there: the first seed of each blob (see
+	findClusters) with a readable bulls-eye gives the code's center and
+	size.  Blobs with no readable bulls-eye are dropped.  At full
+	resolution, only a window just big enough for each code is
+	thresholded (all windows at once, stacked into one image) and
+	decoded.  A window whose code doesn't decode is scanned in full on
+	its own.
+
+	Like a band scan, this doesn't keep the binary planes of the image.
+	'''
+	def scanPyramid(self, image, level = None):
+		if level is None:
+			level = self.getPyramidLevel(image.shape[1], image.shape[0])
+		f = 1 << level
+
+		self.image = image
+		self.preview = None
+		self.w = image.shape[1]
+		self.h = image.shape[0]
+		self.intensity = self.bw = self.candidates = None
+		self.counts = None
+		self.left = self.right = self.up = self.down = None
+		self.tcount = self.vcount = self.vhits = 0
+
+		#----------------------------------------
+		# Read the candidates of the shrunken
+		# image
+		#----------------------------------------
+		coarse = self.helper('coarse')
+		coarse.maxu = max(1, int(math.ceil(self.maxu / float(f))))
+		coarse.load(cv2.resize(image, (self.w // f, self.h // f), interpolation=cv2.INTER_AREA))
+		coarse.markCandidates()
+		self.ccount = coarse.ccount
+
+		hints = []
+		grid = SpotGrid(coarse.maxu, 4)
+		for seeds in coarse.findClusters():
+			for (i, j) in seeds:
+				if (grid.overlaps(i, j)):
+					break
+				hint = TopCode()
+				hint.decode(coarse, i, j)
+				if (hint.unit > 0):
+					if (hint.isValid()):
+						grid.add(hint)
+					hints.append(hint)
+					break
+
+		#----------------------------------------
+		# Window around each code at full size,
+		# with a few extra rows above to settle
+		# the threshold filter
+		#----------------------------------------
+		windows = []
+		for hint in hints:
+			x, y = (hint.x + 0.5) * f - 0.5, (hint.y + 0.5) * f - 0.5
+			hint.unit *= f
+			r = int(math.ceil(min(self.maxu, hint.unit * 1.25) * 4.5)) + 2
+			cx, cy = int(round(x)), int(round(y))
+			x0, x1 = max(0, cx - r), min(self.w, cx + r + 1)
+			y0, y1 = max(0, cy - r - self.BAND_LEAD), min(self.h, cy + r + 1)
+			if (x1 - x0 >= 5 and y1 - y0 >= 5):
+				windows.append((hint, cx, cy, x0, y0, x1, y1))
+		self.rcount = coarse.rcount
+		self.allocated = coarse.allocated
+		if (not windows):
+			return []
+
+		#----------------------------------------
+		# Stack the windows (padded out to the
+		# widest) and threshold them in one go
+		#----------------------------------------
+		mosaic, offsets = stackWindows(image, [ (x0, y0, x1, y1) for (hint, cx, cy, x0, y0, x1, y1) in windows ])
+
+		stack = self.helper('stack')
+		stack.load(mosaic)
+
+		spots = []
+		grid = SpotGrid(self.maxu, 4)
+		for (hint, cx, cy, x0, y0, x1, y1), o in zip(windows, offsets):
+			if (grid.overlaps(cx, cy)):
+				continue
+			spot = TopCode()
+			self.tcount += 1
+			spot.decode(stack, cx - x0, cy - y0 + o)
+			if (spot.isValid()):
+				spot.y -= o
+				found = [ spot ]
+			else:
+				window = self.helper('window')
+				window.load(image[y0:y1, x0:x1])
+				window.markCandidates()
+				found = window.findCodes()
+				self.tcount += window.tcount
+				self.rcount += window.rcount
+				self.allocated += window.allocated
+
+			for spot in found:
+				spot.x += x0
+				spot.y += y0
+				if (not grid.overlaps(spot.x, spot.y)):
+					spots.append(spot)
+					grid.add(spot)
+
+		self.rcount += stack.rcount
+		self.allocated += stack.allocated
+		return spots
+
+
+	'''
+	Returns the helper scanner of the given name (see scanPyramid), set
+	up like this one.  Helpers are kept from frame to frame, so their
+	buffers are reused like the scanner's own.
+	'''
+	def helper(self, name):
+		scanner = self.helpers.get(name)
+		if scanner is None:
+			scanner = self.helpers[name] = Scanner()
+		scanner.setSettings(self.getSettings())
+		return scanner
+
+
 	'''
-	def scan(self, image = None, filename = None):
+	Returns the given image, or reads it from filename (not both).
+	'''
+	def openImage(self, image = None, filename = None):
 		if(image is None and filename is None):
 			raise TypeError("Please provide filename or image")
 		if(image is not None and filename is not None):
 			raise TypeError("Please provide only one argument, not both")
 
 		if image is None:
-			self.image = cv2.imread(filename,1)
-			if self.image is None:
+			image = cv2.imread(filename,1)
+			if image is None:
 				raise IOError("Image not found")
+		return image
+
+
+	'''
+	Scan the given image or file(not both) in horizontal bands, one per
+	process, and return a list of all topcodes found in it.  Bands
+	overlap by maxu * 8 rows (the largest code) plus a margin, so every
+	code lies whole inside the band that owns its center row.
+
+	The threshold filter carries a running sum from pixel to pixel, so
+	a band can't just start from the default sum.  Instead each band
+	starts BAND_LEAD or more rows above its first row and runs the
+	filter over those rows as well.  The sum at the end of the lead-in
+	is compared for the lowest and highest possible starting sums (see
+	Wellner.spread) and the lead-in grows until they agree.  When they
+	do, the band's output is exactly that of scan().  Otherwise the
+	largest difference left is kept (see getBandGap).
+
+	The binary planes of the bands are not kept, so getPreview and
+	friends are not available after a band scan.
+	'''
+	def scanBands(self, image = None, filename = None, processes = None, bands = None):
+		image = self.openImage(image, filename)
+		if processes is None:
+			processes = multiprocessing.cpu_count()
+		if bands is None:
+			bands = processes
+
+		self.image = image
+		self.preview = None
+		self.w = image.shape[1]
+		self.h = image.shape[0]
+		self.intensity = self.bw = self.candidates = None
+		self.counts = None
+		self.left = self.right = self.up = self.down = None
+
+		#----------------------------------------
+		# Split the rows into bands, each with its
+		# own overlap and room for a lead-in
+		#----------------------------------------
+		over = self.maxu * 4 + 4
+		edges = np.linspace(0, self.h, max(1, bands) + 1).astype(int)
+		jobs = []
+		for y0, y1 in zip(edges[:-1], edges[1:]):
+			if (y1 <= y0):
+				continue
+			top = max(0, y0 - over)
+			bottom = min(self.h, y1 + over)
+			first = max(0, top - over)
+			first -= first % 2
+			jobs.append((image[first:bottom], first, top, y0, y1, self.getSettings()))
+
+		if (processes > 1 and len(jobs) > 1):
+			pool = multiprocessing.Pool(min(processes, len(jobs)))
+			try:
+				results = pool.map(scanBand, jobs)
+			finally:
+				pool.close()
+				pool.join()
 		else:
-			self.image = image
+			results = map(scanBand, jobs)
+
+		#----------------------------------------
+		# Merge, dropping codes found twice in an
+		# overlap
+		#----------------------------------------
+		spots = []
+		grid = SpotGrid(self.maxu)
+		self.ccount = self.tcount = self.bandGap = 0
+		for found, gap, ccount, tcount in results:
+			self.ccount += ccount
+			self.tcount += tcount
+			self.bandGap = max(self.bandGap, gap)
+			for spot in found:
+				if (not grid.overlaps(spot.x, spot.y)):
+					spots.append(spot)
+					grid.add(spot)
+		return spots
 
-		if len(self.image.shape) < 3:
-			self.image = cv2.cvtColor(self.image,cv2.COLOR_GRAY2RGB)
 
+	'''
+	Scans a sequence of images (file names or already loaded images,
+	which may be mixed) across a pool of worker processes, with the
+	same settings as this scanner.  This is a generator yielding
+	(index, codes) for every image in input order.  At most window
+	images (twice the number of workers by default) are loaded or in
+	flight at any time, so items can come from a lazy iterator over a
+	large archive.  With one worker the images are scanned in this
+	process, one at a time.
+	'''
+	def scanMany(self, images, workers = None, window = None):
+		if workers is None:
+			workers = multiprocessing.cpu_count()
+		if window is None:
+			window = 2 * workers
+		settings = self.getSettings()
+
+		if (workers <= 1):
+			for index, item in enumerate(images):
+				yield index, scanItem((item, settings))
+			return
+
+		pool = multiprocessing.Pool(workers)
+		try:
+			pending = collections.deque()
+			for index, item in enumerate(images):
+				if (len(pending) >= max(1, window)):
+					yield pending[0][0], pending.popleft()[1].get()
+				pending.append((index, pool.apply_async(scanItem, ((item, settings),))))
+			while pending:
+				yield pending[0][0], pending.popleft()[1].get()
+			pool.close()
+		finally:
+			pool.terminate()
+			pool.join()
 
+
+	'''
+	Load the given image and run the adaptive threshold filter on it,
+	leaving the scanner ready to decode TopCodes at known points.
+	'''
+	def load(self, image):
+		self.image = image
 		self.preview = None
 		self.w = self.image.shape[1]
 		self.h = self.image.shape[0]
-		self.data = self.getRGB(self.image)
+		self.vcount = 0
+		self.vhits = 0
+		self.rcount = 0
+		self.allocated = 0
+		self.intensity = self.getIntensity(self.image)
+		if (self.timer is not None):
+			self.timer.lap('intensity')
+		self.threshold()
+		if (self.timer is not None):
+			self.timer.lap('threshold')
 
-		self.threshold()		  # run the adaptive threshold filter
-
-		return self.findCodes()   # scan for topcodes
 
 	'''
-	Convert an opencv image to a linear array
+	Convert an opencv image to a linear array of packed ARGB pixels.
+	Color images are read as BGR; grayscale images are replicated
+	into all three channels.  The scanner itself no longer uses packed
+	pixels (scan() reads the image with getIntensity); this is kept
+	only for external callers.
 	'''
 	def getRGB(self, image):
-		data = np.zeros([self.w*self.h], dtype=np.int32)
-		for y in xrange(0, self.h):
-			for x in xrange(0,self.w):
-				b,g,r = image[y][x]
-				pixel = (0xFF << 24) | ((r & 0xFF) << 16) | ((g & 0xFF) << 8) | (b & 0xFF)
-				data[y * self.w + x] = pixel
-		return data
+		if image.ndim < 3:
+			data = image.astype(np.uint32) * 0x010101
+		else:
+			data = image[:, :, 2].astype(np.uint32) << 16
+			data |= image[:, :, 1].astype(np.uint32) << 8
+			data |= image[:, :, 0]
+		data |= 0xFF000000
+		return data.view(np.int32).reshape(image.shape[0] * image.shape[1])
+
+
+	'''
+	Convert an opencv image to a plane of pixel intensities (0-255),
+	the average of the three color channels.  The plane is written to
+	out (an int32 array of the image's height and width) if given.
+	'''
+	def getIntensity(self, image, out = None):
+		if out is None:
+			out = np.empty(image.shape[:2], np.int32)
+		if image.ndim < 3:
+			out[...] = image
+			return out
+		np.add(image[:, :, 0], image[:, :, 1], out=out, dtype=np.int32)
+		out += image[:, :, 2]
+		out //= 3
+		return out
+
+
+	'''
+	Returns the working buffer of the given name, reused from frame to
+	frame while its shape and type stay the same.  It holds whatever
+	was left in it by the last frame.  Only the planes the scanner
+	keeps after a scan (the binary, counts and candidate planes and the
+	preview) are buffers; the intensity plane and other temporaries are
+	allocated per frame and released, so an idle scanner holds about
+	3 bytes per pixel, plus 3 more once a preview is drawn.
+	'''
+	def buffer(self, name, shape, dtype):
+		buf = self.buffers.get(name)
+		if (buf is None or buf.shape != shape or buf.dtype != dtype):
+			buf = self.buffers[name] = np.empty(shape, dtype)
+			self.allocated += buf.nbytes
+		return buf
 
 
 	'''
@@ -166,12 +643,161 @@ class Scanner(object):
 		return self.tcount
 
 
+	'''
+	Returns the largest possible error in the threshold filter's running
+	sum at the start of any band of the last band scan.  Zero means the
+	scan saw exactly the same binary image as scan() would have.
+	'''
+	def getBandGap(self):
+		return self.bandGap
+
+
+	'''
+	Returns the number of hinted decodes tried since the image was loaded
+	'''
+	def getVerifyCount(self):
+		return self.vcount
+
+
+	'''
+	Returns the number of hinted decodes confirmed by the fast path
+	(without the full search) since the image was loaded
+	'''
+	def getVerifyHitCount(self):
+		return self.vhits
+
+
+	'''
+	Selects the implementation of the adaptive threshold filter.
+	'numpy' (the default) is a vectorized engine; 'python' is the
+	original pixel-by-pixel loop.  Both produce identical output.
+	'''
+	def setThresholdEngine(self, engine):
+		if engine not in self.THRESHOLD_ENGINES:
+			raise ValueError("Unknown threshold engine: " + str(engine))
+		self.engine = engine
+
+
+	'''
+	Turns run tables on or off.  With run tables, xdist, ydist and
+	TopCode.readUnit become table lookups instead of pixel walks, at
+	the cost of four extra planes per frame (see buildRunTables).
+	'''
+	def setRunTables(self, enabled):
+		self.runTables = enabled
+
+
+	'''
+	Selects the implementation of the scanner's tight loops: the
+	threshold filter, the pixel walks of xdist, ydist and
+	TopCode.readUnit, and TopCode.readCodes.  'jit' uses the kernels of
+	Kernels.py compiled by numba, and raises ValueError if numba isn't
+	installed; 'numpy' uses the code in this file and TopCode.py.
+	'auto' (the default) picks 'jit' when numba is installed.  Both
+	produce identical output.  The 'python' threshold engine is always
+	the pixel-by-pixel loop.
+	'''
+	def setBackend(self, backend):
+		if backend not in self.BACKENDS:
+			raise ValueError("Unknown backend: " + str(backend))
+		if (backend == 'jit' and not Kernels.AVAILABLE):
+			raise ValueError("The jit backend needs numba")
+		self.backend = backend
+		self.jit = Kernels.AVAILABLE if (backend == 'auto') else (backend == 'jit')
+
+
+	'''
+	Returns True if the compiled kernels are in use (see setBackend).
+	'''
+	def isJit(self):
+		return self.jit
+
+
+	'''
+	Compiles the kernels of the jit backend (or loads them from numba's
+	cache) now, so the first frame scanned doesn't pay for it.  Does
+	nothing with the numpy backend.
+	'''
+	def warmup(self):
+		if self.jit:
+			Kernels.warmup()
+
+
+	'''
+	Returns the scanner's settings (maximum unit, threshold engine, run
+	tables, minimum unit, pyramid mode, decode stop and backend) so
+	another scanner, possibly in another process, can be set up the
+	same way with setSettings.
+	'''
+	def getSettings(self):
+		return (self.maxu, self.engine, self.runTables, self.minu, self.pyramid, self.stop, self.backend)
+
+
+	'''
+	Applies settings returned by getSettings.
+	'''
+	def setSettings(self, settings):
+		self.maxu, self.engine, self.runTables, self.minu, self.pyramid, self.stop, backend = settings
+		self.setBackend(backend)
+
+
+	'''
+	Sets the minimum diameter (in pixels) of the TopCodes to look for.
+	Only used to pick the pyramid level (see setPyramid); smaller codes
+	may still be found, but aren't guaranteed to be.
+	'''
+	def setMinCodeDiameter(self, diameter):
+		self.minu = diameter / 8.0
+
+
+	'''
+	Turns pyramid mode on or off.  In pyramid mode scan() looks for
+	candidates on a downsampled copy of the image and only decodes them
+	at full resolution (see scanPyramid).  Needs a minimum code
+	diameter to pick the level.
+	'''
+	def setPyramid(self, enabled):
+		self.pyramid = enabled
+
+
+	'''
+	Sets the confidence (a fraction of the highest possible) at which
+	the adaptive decode search stops refining a reading (see
+	TopCode.search).  None reads the full grid of 5 unit by 10 arc
+	adjustments for every point tested, and gives exactly the output
+	of earlier versions.  With a stop set (the default is
+	TopCode.STOP_CONFIDENCE), centers match the full grid, and so did
+	every ID in testing, but where several readings are nearly as good
+	a code's orientation may differ by up to four arc steps (0.19
+	radians, usually at most one) and its unit by up to 22% (see
+	TopCode.search for the measurements).
+	'''
+	def setDecodeStop(self, stop):
+		self.stop = stop
+
+
+	'''
+	Returns the number of times the image is halved in pyramid mode:
+	as often as the smallest codes keep PYRAMID_MIN_UNIT pixels per
+	unit, and the largest keep at least one pixel.  If the image size
+	is given, the shrunken image also keeps at least PYRAMID_MIN_SIZE
+	pixels across and down.  Zero means pyramid mode scans at full
+	resolution.
+	'''
+	def getPyramidLevel(self, width = None, height = None):
+		level = 0
+		while (self.minu / 2.0 ** (level + 1) >= self.PYRAMID_MIN_UNIT and self.maxu >> (level + 1) >= 1):
+			if (width is not None and min(width, height) >> (level + 1) < self.PYRAMID_MIN_SIZE):
+				break
+			level += 1
+		return level
+
+
 	'''
 	Binary (thresholded black/white) value for pixel (x,y)
 	'''
   	def getBW(self, x, y):
-	 	pixel = self.data[y * self.w + x]
-	 	return (pixel >> 24) & 0x01
+	 	return self.bw[y, x]
 
 
 	'''
@@ -181,15 +807,18 @@ class Scanner(object):
   	def getSample3x3(self, x, y):
 	 	if (x < 1 or x > (self.w-2) or y < 1 or y >= (self.h-2)):
 	 		return 0
-	 	pixel, sum = 0, 0
+	  	return int(self.SAMPLE_3x3[self.counts.item(y, x)])
 
-	 	for j in xrange(y-1,y+2):
-	 		for i in xrange(x-1,x+2):
-				pixel = self.data[j * self.w + i]
-				if ((pixel & 0x01000000) > 0):
-				   sum += 0xff
-	  	#return (sum >= 5) ? 1 : 0
-	  	return int(sum / 9)
+
+	'''
+	Array version of getSample3x3() for arrays of x and y coordinates
+	of any (matching) shape, gathered from the counts plane at once.
+	'''
+	def getSamples3x3(self, xs, ys):
+		inside = (xs >= 1) & (xs <= (self.w-2)) & (ys >= 1) & (ys < (self.h-2))
+		samples = self.SAMPLE_3x3[self.counts[np.where(inside, ys, 1), np.where(inside, xs, 1)]].astype(np.int32)
+		samples[~inside] = 0
+		return samples
 
 
 	'''
@@ -199,54 +828,166 @@ class Scanner(object):
   	def getBW3x3(self, x, y):
 	 	if (x < 1 or x > (self.w-2) or y < 1 or y >= (self.h-2)):
 	 		return 0
-	 	pixel, sum = 0, 0
+		return 1 if (self.counts.item(y, x) >= 5) else 0
 
-	 	for j in xrange(y-1,y+2,1):
-	 		for i in xrange(x-1,x+2):
-				pixel = self.data[j * self.w + i]
-				sum += ((pixel >> 24) & 0x01)
-
-		return 1 if (sum >= 5) else 0
 
+	'''
+	Counts the white pixels of the binary plane in the 3x3 region
+	around every pixel at once, into the counts plane.  Counts are zero
+	along the image edges where the accessors return zero.
+	'''
+	def filter3x3(self):
+		self.counts = self.buffer('counts', (self.h, self.w), np.uint8)
+		self.counts.fill(0)
+		if (self.w >= 3 and self.h >= 4):
+			inner = self.counts[1:self.h-2, 1:self.w-1]
+			for j in xrange(0, 3):
+				for i in xrange(0, 3):
+					inner += self.bw[j:self.h-3+j, i:self.w-2+i]
 
 
 	'''
-	Perform Wellner adaptive thresholding to produce binary pixel
-	data.  Also mark candidate spotcode locations.
+	Perform Wellner adaptive thresholding to produce the binary pixel
+	plane and its 3x3 averages.  The intensity plane is released
+	afterwards.
 
 	"Adaptive Thresholding for the DigitalDesk"
 	EuroPARC Technical Report EPC-93-110
 	'''
- 	def threshold(self):
- 		q = 0
-	 	pixel, r, g, b, a = 0, 0, 0, 0, 0
+	def threshold(self):
+		if self.engine == 'python':
+			self.thresholdPython()
+		elif self.jit:
+			self.bw = self.buffer('bw', (self.h, self.w), np.uint8)
+			Kernels.wellner(self.intensity, self.bw, self.buffer('sums', (self.w,), np.int32))
+		else:
+			self.thresholdNumpy()
+		self.intensity = None
+		self.filter3x3()
+		if (self.runTables):
+			self.buildRunTables()
+		else:
+			self.left = self.right = self.up = self.down = None
+
+
+	'''
+	Vectorized adaptive threshold.  The running sums come from
+	Wellner.runningSums over the pixels in the same back and forth
+	order used by thresholdPython, so the output is identical.
+	'''
+	def thresholdNumpy(self):
+		s = 30
+		a = self.intensity
+
+		#----------------------------------------
+		# Running sums, visiting rows back and
+		# forth like the serial filter
+		#----------------------------------------
+		a[1::2] = a[1::2, ::-1]
+		sums = Wellner.runningSums(a.reshape(-1), s, 128).reshape(self.h, self.w)
+		a[1::2] = a[1::2, ::-1]
+		sums[1::2] = sums[1::2, ::-1]
+
+		#----------------------------------------
+		# Factor in sums from the previous row and
+		# compare to decide black or white
+		#----------------------------------------
+		# (in place over overlapping rows: numpy 1.13 and later buffer
+		# the operands of an overlapping ufunc, so sums[:-1] is read
+		# before any row is updated)
+		threshold = sums
+		threshold[1:] += sums[:-1]
+		threshold[:1] //= s
+		threshold[1:] //= (2*s)
+
+		# a >= threshold * 0.975, in integers
+		a *= 40
+		threshold *= 39
+		self.bw = self.buffer('bw', (self.h, self.w), np.uint8)
+		np.greater_equal(a, threshold, out=self.bw.view(bool))
+
+
+	'''
+	Mark candidate spotcode locations in the binary pixel plane.  Each
+	row is run length encoded in the same direction the threshold
+	filter visited it, and every black, white, black sequence of runs
+	that meets the bulls-eye ratio constraints is tested at once.  The
+	middle of the white run (and its two neighbors) is marked.
+	'''
+	def markCandidates(self):
+		maxu = self.maxu
+		bw = np.empty((self.h, self.w), np.uint8)
+		bw[0::2] = self.bw[0::2]
+		bw[1::2] = self.bw[1::2, ::-1]
+
+		#----------------------------------------
+		# Run length encode every row
+		#----------------------------------------
+		edges = np.empty(bw.shape, bool)
+		edges[:, 0] = True
+		np.not_equal(bw[:, 1:], bw[:, :-1], out=edges[:, 1:])
+		starts = np.flatnonzero(edges)
+		row = starts // self.w
+		col = starts % self.w
+		lengths = np.diff(np.append(col, self.w))
+		lengths[:-1][row[1:] != row[:-1]] = self.w - col[:-1][row[1:] != row[:-1]]
+
+		#----------------------------------------
+		# A black run (b2) closed off by a white
+		# run, preceded by white (w1) and black
+		# (b1) runs on the same row
+		#----------------------------------------
+		r = np.arange(2, len(starts) - 1)
+		r = r[(bw.flat[starts[r]] == 0) & (row[r - 2] == row[r]) & (row[r + 1] == row[r])]
+		b1 = lengths[r - 2]
+		w1 = lengths[r - 1]
+		b2 = lengths[r]
+		ok = ((b1 >= 2) & (b2 >= 2) & (b1 <= maxu) & (b2 <= maxu) & (w1 <= (maxu + maxu)) &
+			  (np.abs(b1 + b2 - w1) <= (b1 + b2)) & (np.abs(b1 + b2 - w1) <= w1) &
+			  (np.abs(b1 - b2) <= b1) & (np.abs(b1 - b2) <= b2))
+		r = r[ok]
+
+		dk = col[r] - 1 - w1[ok] // 2
+		odd = (row[r] % 2) != 0
+		dk[odd] = self.w - 1 - dk[odd]
+		j = row[r]
+
+		self.candidates = self.buffer('candidates', (self.h, self.w), bool)
+		self.candidates.fill(False)
+		self.candidates[j, dk - 1] = True
+		self.candidates[j, dk] = True
+		self.candidates[j, dk + 1] = True
+		self.ccount = 3 * len(dk)  # count candidate codes
+		self.preview = None
+
+
+	'''
+	Pixel-by-pixel adaptive threshold filter.
+	'''
+ 	def thresholdPython(self):
 	 	threshold, sum = 128, 128
 	 	s = 30
-	 	k = 0
-	 	b1, w1, b2, level, dk = 0, 0, 0, 0, 0
+	 	x = 0
+
+	 	self.bw = self.buffer('bw', (self.h, self.w), np.uint8)
+
+	 	# Running sums of the previous row
+	 	sums = np.zeros(self.w, np.int32)
 
-	 	self.ccount = 0
 	 	for j in xrange(0, self.h):
-			level = b1 = b2 = w1 = 0
 
 			#----------------------------------------
 			# Process rows back and forth (alternating
 			# left-to-right, right-to-left)
 			#----------------------------------------
-			k = 0 if (j % 2 == 0) else (self.w-1)
-			k += (j * self.w)
+			x = 0 if (j % 2 == 0) else (self.w-1)
 
 			for i in xrange(0,self.w):
 
 				#----------------------------------------
-				# Calculate pixel intensity (0-255)
+				# Pixel intensity (0-255)
 				#----------------------------------------
-				pixel = self.data[k]
-				r = (pixel >> 16) & 0xff
-				g = (pixel >> 8) & 0xff
-				b = pixel & 0xff
-				a = (r + g + b) / 3
-				#a = r
+				a = self.intensity[j, x]
 
 				#----------------------------------------
 				# Calculate sum as an approximate sum
@@ -257,12 +998,11 @@ class Scanner(object):
 				#----------------------------------------
 				# Factor in sum from the previous row
 				#----------------------------------------
-				if (k >= self.w):
-				   threshold = (sum + (self.data[k-self.w] & 0xffffff)) / (2*s)
+				if (j > 0):
+				   threshold = (sum + sums[x]) / (2*s)
 				else:
 				   threshold = sum / s
-
-
+				sums[x] = sum
 
 				#----------------------------------------
 				# Compare the average sum to current pixel
@@ -270,113 +1010,176 @@ class Scanner(object):
 				#----------------------------------------
 				f = 0.85
 				f = 0.975
-				a = 0 if (a < threshold * f) else 1
+				self.bw[j, x] = 0 if (a < threshold * f) else 1
 
+				x += 1 if (j % 2 == 0) else -1
 
 
-				#----------------------------------------
-				# Repack pixel data with binary data in
-				# the alpha channel, and the running sum
-				# for this pixel in the RGB channels
-				#----------------------------------------
-				self.data[k] = (a << 24) + (sum & 0xffffff)
 
-				# On a white region. No black pixels yet
-				if level == 0:
-				  	if (a == 0):  # First black encountered
-					 	level = 1
-					 	b1 = 1
-					 	w1 = 0
-					 	b2 = 0
+	'''
+	Scan the image for TopCodes.  Each blob of candidate centers is
+	decoded once at its centroid, largest blobs first.  Only the blobs
+	whose centroid fails get a few of their own pixels tried afterwards.
+	Points that fall inside a code already found (within four units of
+	its center) are skipped.
+	'''
+  	def findCodes(self):
+	 	self.tcount = 0
+	  	spots = []
+	  	grid = SpotGrid(self.maxu, 4)
+	  	clusters = self.findClusters()
+
+	 	spot = TopCode()
+	 	for seeds in [ seeds[:1] for seeds in clusters ] + [ seeds[1:] for seeds in clusters ]:
+	 		for (i, j) in seeds:
+				if (grid.overlaps(i, j)):
+					continue
+				self.tcount += 1
+				spot.decode(self, i, j)
+				if (spot.isValid()):
+					spots.append(spot)
+					grid.add(spot)
+					spot = TopCode()
+					break
 
-				# On first black region
-				elif level == 1:
-				  	if (a == 0):
-					 	b1 += 1
-				  	else:
-					 	level = 2
-					 	w1 = 1
+		return spots
 
 
+	'''
+	Groups candidate centers (see findCenters) into 8-connected blobs,
+	one per bulls-eye, largest first.  Returns a list of seed points
+	(x,y) for each blob: its centroid followed by up to FALLBACK_SEEDS of
+	its other pixels spread out in scan line order.
+	'''
+	def findClusters(self):
+		centers = self.findCenters()
+		if (len(centers) == 0):
+			return []
+
+		mask = np.zeros(self.w * self.h, np.uint8)
+		mask[centers] = 1
+		n, labels, stats, centroids = cv2.connectedComponentsWithStats(mask.reshape(self.h, self.w), connectivity=8)
+
+		#----------------------------------------
+		# Gather the pixels of each blob, keeping
+		# them in scan line order
+		#----------------------------------------
+		labels = labels.reshape(self.w * self.h)[centers]
+		order = np.argsort(labels, kind='mergesort')
+		bounds = np.searchsorted(labels[order], np.arange(1, n + 1))
+
+		clusters = []
+		for b in np.argsort(-stats[1:, cv2.CC_STAT_AREA], kind='mergesort') + 1:
+			cx, cy = centroids[b]
+			seeds = [ (int(round(cx)), int(round(cy))) ]
+			pixels = centers[order[bounds[b - 1]:bounds[b]]]
+			picks = np.linspace(0, len(pixels) - 1, min(len(pixels), self.FALLBACK_SEEDS)).astype(int)
+			for k in np.unique(pixels[picks]):
+				j, i = divmod(int(k), self.w)
+				if ((i, j) != seeds[0]):
+					seeds.append((i, j))
+			clusters.append(seeds)
+		return clusters
 
-				# On second white region (bulls-eye of a code?)
-				elif level == 2:
-				  	if (a == 0):
-					 	level = 3
-					 	b2 = 1
-				  	else:
-					 	w1 += 1
 
+	'''
+	Returns the linear pixel indices (y * width + x) of every candidate
+	pixel whose left, right, upper and lower neighbors are also
+	candidates, in scan line order.  Rows closer than two pixels to the
+	top or bottom of the image are skipped.
+	'''
+	def findCenters(self):
+		if (self.h < 5):
+			return np.zeros(0, np.intp)
+		w = self.w
+		marks = self.candidates.reshape(w * self.h)
+		lo, hi = w * 2, w * (self.h - 2)
+		hits = (marks[lo:hi] & marks[lo-1:hi-1] & marks[lo+1:hi+1] &
+				marks[lo-w:hi-w] & marks[lo+w:hi+w])
+		return np.flatnonzero(hits) + lo
 
 
-				# On second black region
-				elif level == 3:
-				  	if (a == 0):
-					 	b2 += 1
-				  	# This could be a top code
-				  	else:
-					 	mask = 0
-					 	# less than 2 pixels... not interested
-					 	if (b1 >= 2 and b2 >= 2 and b1 <= self.maxu and b2 <= self.maxu and w1 <= (self.maxu + self.maxu) and math.fabs(b1 + b2 - w1) <= (b1 + b2) and math.fabs(b1 + b2 - w1) <= w1 and math.fabs(b1 - b2) <= b1 and math.fabs(b1 - b2) <= b2):
-							mask = 0x2000000
+	'''
+	Returns True if point (x,y) is in an existing TopCode bullseye
+	'''
+  	def overlaps(self, spots, x, y):
+		for top in spots:
+			if (top.inBullsEye(x, y)):
+				return True
+	 	return False
 
-							dk = 1 + b2 + w1/2
-							if (j % 2 == 0):
-								dk = k - dk
-							else:
-								dk = k + dk
 
-							self.data[dk - 1] |= mask
-							self.data[dk] |= mask
-							self.data[dk + 1] |= mask
-							self.ccount += 3  # count candidate codes
+	'''
+	Precomputes the left, right, up and down run tables of the 3x3
+	majority plane so that color changes can be found without walking
+	pixels.
+	'''
+	def buildRunTables(self):
+		dtype = np.int16 if (max(self.w, self.h) < 0x8000) else np.int32
+		smooth = self.counts >= 5
+		self.left, self.right = self.runLengths(smooth, dtype)
+		up, down = self.runLengths(smooth.T, dtype)
+		self.up, self.down = up.T, down.T
 
-					 	b1 = b2
-					 	w1 = 1
-					 	b2 = 0
-					 	level = 2
 
-				k += 1 if (j % 2 == 0) else -1
+	'''
+	For every pixel of a plane, counts the pixels along its row to the
+	nearest pixel of a different value on the left and on the right.
+	Returns the two tables, with -1 where there is no such pixel.
+	'''
+	def runLengths(self, plane, dtype):
+		n = plane.shape[1]
+		pos = np.arange(0, n)
+		change = np.zeros(plane.shape, bool)
+		change[:, 1:] = plane[:, 1:] != plane[:, :-1]
 
+		#----------------------------------------
+		# First pixel of the run holding each pixel,
+		# and first pixel of the run after it
+		#----------------------------------------
+		start = np.maximum.accumulate(np.where(change, pos, 0), axis=1)
+		end = np.full(plane.shape, n, np.intp)
+		end[:, :-1] = np.minimum.accumulate(np.where(change, pos, n)[:, :0:-1], axis=1)[:, ::-1]
+
+		left = np.where(start > 0, pos - start + 1, -1).astype(dtype)
+		right = np.where(end < n, end - pos, -1).astype(dtype)
+		return left, right
 
 
 	'''
-	Scan the image line by line looking for TopCodes
+	Array versions of xdist() and ydist() for arrays of x and y
+	coordinates inside the image.  Requires run tables.
 	'''
-  	def findCodes(self):
-	 	self.tcount = 0
-	  	spots = []
+	def xdists(self, xs, ys, d):
+		if (d > 0):
+			dist = self.right[ys, xs].astype(np.intp)
+			return np.where((xs >= 1) & (dist > 0) & (xs + dist < self.w - 1), dist, -1)
+		dist = self.left[ys, xs].astype(np.intp)
+		return np.where((dist > 0) & (xs - dist > 1), dist, -1)
 
-	 	spot = TopCode()
-	 	k = self.w * 2
-	 	for j in xrange(2, self.h-2):
-	 		for i in xrange(0,self.w):
-				if ((self.data[k] & 0x2000000) > 0):
-					if ((self.data[k-1] & 0x2000000) > 0 and (self.data[k+1] & 0x2000000) > 0 and (self.data[k-self.w] & 0x2000000) > 0 and (self.data[k+self.w] & 0x2000000) > 0):
-						'''
-				  		if ((self.data[k-self.w] & 0x2000000) > 0 or
-					  	(self.data[k+self.w] & 0x2000000) > 0)):
-						'''
-
-						if (not self.overlaps(spots, i, j)):
-							self.tcount += 1
-							spot.decode(self, i, j)
-							if (spot.isValid()):
-								spots.append(spot)
-								spot = TopCode()
-
-				k += 1
-		return spots
+	def ydists(self, xs, ys, d):
+		if (d > 0):
+			dist = self.down[ys, xs].astype(np.intp)
+			return np.where((ys >= 1) & (dist > 0) & (ys + dist < self.h - 1), dist, -1)
+		dist = self.up[ys, xs].astype(np.intp)
+		return np.where((dist > 0) & (ys - dist > 1), dist, -1)
 
 
 	'''
-	Returns True if point (x,y) is in an existing TopCode bullseye
+	Counts the pixels from (x,y) in direction (dx,dy) to the first
+	white pixel past the first black one, using the run tables.
+	Returns -1 if there is none.  (x+dx,y+dy) must be in the image.
 	'''
-  	def overlaps(self, spots, x, y):
-		for top in spots:
-			if (top.inBullsEye(x, y)):
-				return True
-	 	return False
+	def ringDist(self, x, y, dx, dy):
+		table = self.left if (dx < 0) else self.right if (dx > 0) else self.up if (dy < 0) else self.down
+		i = 1
+		if (self.counts[y + dy, x + dx] >= 5):
+			n = table[y + dy, x + dx]
+			if (n < 0):
+				return -1
+			i += n
+		n = table[y + i * dy, x + i * dx]
+		return -1 if (n < 0) else i + int(n)
 
 
 	'''
@@ -384,6 +1187,10 @@ class Scanner(object):
 	change is perceived.
 	'''
   	def ydist(self, x, y, d):
+	 	if (self.down is not None and abs(d) == 1 and 0 <= x < self.w and 0 <= y < self.h):
+	 		return int(self.ydists(x, y, d))
+	 	if self.jit:
+	 		return int(Kernels.walk(self.counts, x, y, 0, d))
 	 	sample = 0
 	 	start  = self.getBW3x3(x, y)
 	 	j = y + d
@@ -401,6 +1208,10 @@ class Scanner(object):
 	change is perceived.
 	'''
   	def xdist(self, x, y, d):
+	 	if (self.right is not None and abs(d) == 1 and 0 <= x < self.w and 0 <= y < self.h):
+	 		return int(self.xdists(x, y, d))
+	 	if self.jit:
+	 		return int(Kernels.walk(self.counts, x, y, d, 0))
 	 	sample = 0
 	 	start = self.getBW3x3(x, y)
 
@@ -421,31 +1232,119 @@ class Scanner(object):
 
 	'''
 	For debugging purposes, create a black and white image that
-	shows the result of adaptive thresholding.
+	shows the result of adaptive thresholding, with candidate pixels
+	marked in green.  shrink > 1 keeps only every shrink-th pixel of
+	every shrink-th row, for a cheap low resolution preview.
+
+	The image is drawn into out (a uint8 BGR image of the preview's
+	size) if given.  Otherwise it is drawn into a buffer kept by the
+	scanner, once per scan: later calls with the same shrink return
+	it as is until the next image is loaded.
+
+	Raises RuntimeError when no binary planes are kept: before the
+	first image is loaded, and after a pyramid or band scan.
 	'''
-	def getPreview(self):
-	 	self.preview = np.zeros((self.h,self.w,3),np.uint8)
+	def getPreview(self, out = None, shrink = 1):
+		if (out is None and self.preview is not None and self.previewShrink == shrink):
+			return self.preview
+		if self.bw is None:
+			raise RuntimeError("No binary planes to preview: none are kept before an image is loaded, or in pyramid or band mode")
+
+		bw = self.bw[::shrink, ::shrink]
+		if out is None:
+			out = self.buffer('preview', bw.shape + (3,), np.uint8)
+			self.preview = out
+			self.previewShrink = shrink
+		elif (out.shape != bw.shape + (3,) or out.dtype != np.uint8):
+			raise ValueError("Preview needs a " + str(bw.shape[1]) + "x" + str(bw.shape[0]) + " uint8 BGR image")
+
+		#----------------------------------------
+		# Look up the color of every pixel from
+		# its binary and candidate bits
+		#----------------------------------------
+		pixel = np.empty(bw.shape, np.uint8)
+		if self.candidates is None:
+			pixel.fill(0)
+		else:
+			pixel[...] = self.candidates[::shrink, ::shrink]
+			pixel <<= 1
+		pixel |= bw
+		np.take(self.PREVIEW_COLORS, pixel, axis=0, out=out, mode='clip')
+		return out
 
-	 	k = 0
-	 	for j in xrange(0, self.h):
-	 		for i in xrange(0,self.w):
-	 			pixel = (self.data[k]>> 24)
-	 			k+=1
-				if (pixel == 0):
-					pixel = 0xFF000000
-				elif (pixel == 1):
-					pixel = 0xFFFFFFFF
-				elif (pixel == 3):
-					pixel = 0xFF00FF00
-				elif (pixel == 7):
-					pixel = 0xFFFF0000
-
-				a = (pixel >> 24) & 0xFF
-				r = (pixel >> 16) & 0xFF
-				g = pixel >> 8 & 0xFF
-				b = pixel & 0xFF
-
-
-				self.preview[j][i] =  (b,g,r)
-
-	 	return self.preview
+
+'''
+Stacks the windows (x0, y0, x1, y1) of image on top of each other into
+one image, each padded out to the widest by repeating its last column,
+so they can all be thresholded with a single load().  Returns the
+stacked image and the row where each window starts in it.
+'''
+def stackWindows(image, windows):
+	width = max([ x1 - x0 for (x0, y0, x1, y1) in windows ])
+	height = sum([ y1 - y0 for (x0, y0, x1, y1) in windows ])
+	mosaic = np.empty((height, width) + image.shape[2:], image.dtype)
+	offsets = []
+	o = 0
+	for (x0, y0, x1, y1) in windows:
+		mosaic[o:o + y1 - y0, :x1 - x0] = image[y0:y1, x0:x1]
+		mosaic[o:o + y1 - y0, x1 - x0:] = image[y0:y1, x1 - 1:x1]
+		offsets.append(o)
+		o += y1 - y0
+	return mosaic, offsets
+
+
+'''
+Scans one band of an image for scanBands (module level so a process
+pool can run it).  job holds the rows of the image from first up to
+the bottom of the band, the first row of the band's overlap (top) and
+of the rows it owns (y0 to y1), and the scanner's settings.  Returns
+the codes centered on the band's own rows, the error left in the
+running sum at top (0 when the lead-in settled it) and the candidate
+and tested counts.
+'''
+def scanBand(job):
+	rows, first, top, y0, y1, settings = job
+	scanner = Scanner()
+	scanner.setSettings(settings)
+
+	#----------------------------------------
+	# Grow the lead-in (keeping the rows in
+	# the same back and forth order) until the
+	# sums two rows above top no longer depend
+	# on the starting sum
+	#----------------------------------------
+	a = scanner.getIntensity(rows[:top - first])
+	a[1::2] = a[1::2, ::-1]
+	lead = Scanner.BAND_LEAD + top % 2
+	while True:
+		if (top - lead <= first):
+			lead = top - first
+			gap = Wellner.spread(a[:lead - 2].reshape(-1)) if first > 0 else 0
+			break
+		gap = Wellner.spread(a[top - lead - first:top - 2 - first].reshape(-1))
+		if (gap == 0):
+			break
+		lead += 2
+
+	start = top - lead
+	scanner.load(rows[start - first:])
+	scanner.markCandidates()
+	spots = []
+	for spot in scanner.findCodes():
+		spot.y += start
+		if (y0 <= spot.y < y1):
+			spots.append(spot)
+	return spots, gap, scanner.ccount, scanner.tcount
+
+
+'''
+Scans one image for scanMany (module level so a process pool can run
+it).  job holds the image or its file name, and the scanner settings.
+'''
+def scanItem(job):
+	item, settings = job
+	scanner = Scanner()
+	scanner.setSettings(settings)
+	if isinstance(item, basestring):
+		return scanner.scan(filename=item)
+	return scanner.scan(image=item)
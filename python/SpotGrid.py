@@ -0,0 +1,71 @@
+'''
+ * @(#) SpotGrid.py
+ *
+ * Tangible Object Placement Codes (TopCodes)
+ * Copyright (c) 2026 The topcode-python contributors
+ *
+ * This program is free software you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License (version 2) as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful, but
+ * WITHOUT ANY WARRANTY without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program if not, write to the Free Software
+ * Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+'''
+
+'''
+ * Uniform grid of decoded TopCodes used to answer "is this point
+ * inside a code we already found?" without testing every code.  A code
+ * covers a circle of reach units in radius around its center (one unit
+ * is the bulls-eye, four the whole symbol).  Each code is filed under
+ * every cell touched by the bounding box of that circle, so only the
+ * codes filed under the point's own cell need to be checked.
+ *
+ * @author The topcode-python contributors
+'''
+
+class SpotGrid(object):
+
+
+	'''
+	Create an empty grid with square cells of the given size in pixels
+	'''
+	def __init__(self, size, reach = 1.0):
+		''' Width and height of a grid cell in pixels '''
+		self.size = max(1, size)
+
+		''' Radius covered by a code, in units '''
+		self.reach = reach
+
+		''' Codes filed by (column, row) cell '''
+		self.cells = {}
+
+
+	'''
+	Files a decoded TopCode under each cell it covers
+	'''
+	def add(self, spot):
+		r = spot.unit * self.reach
+		x0 = int((spot.x - r) // self.size)
+		x1 = int((spot.x + r) // self.size)
+		y0 = int((spot.y - r) // self.size)
+		y1 = int((spot.y + r) // self.size)
+		for cy in xrange(y0, y1 + 1):
+			for cx in xrange(x0, x1 + 1):
+				self.cells.setdefault((cx, cy), []).append(spot)
+
+
+	'''
+	Returns True if point (x,y) is covered by a filed TopCode
+	'''
+	def overlaps(self, x, y):
+		for top in self.cells.get((int(x // self.size), int(y // self.size)), ()):
+			r = top.unit * self.reach
+			if (((top.x - x) * (top.x - x) + (top.y - y) * (top.y - y)) <= (r * r)):
+				return True
+		return False
@@ -0,0 +1,150 @@
+'''
+Golden-output check of the threshold filter and what is found with it.
+The golden outputs (ThresholdCheck.json) were recorded from the
+original pixel-by-pixel Scanner.py and TopCode.py of the first commit
+(97e5b34), on synthetic frames (see Render.py), frames of random noise
+and flat frames:
+
+ bw, candidates - hashes of the binary plane and the candidate marks
+ codes          - the codes its scan() found (ID and center)
+ decodes        - TopCode.decode at every candidate center it tested
+
+Both threshold engines (see Scanner.setThresholdEngine) must give the
+recorded planes, and the same scan() results as each other.  scan()
+must find the recorded IDs, with centers within CENTER_TOLERANCE
+pixels (blobs of candidates are now decoded from their centroid, see
+Scanner.findCodes), and decoding the recorded points with the full
+unit and arc grid (Scanner.setDecodeStop(None)) must give exactly the
+recorded codes.  Wellner.runningSums is also compared with the serial
+running sum, including segment lengths short enough to cut each
+sequence into many segments.
+
+Frames are only compared with the recorded outputs for --seed 0, and
+fail if they don't match the recorded frame.  The pixel-by-pixel
+engine is slow, so the frames are small.  Exits with status 1 on any
+difference.
+
+usage: python ThresholdCheck.py [--sizes 320x240,160x120,97x61,5x3] [--seed 0]
+'''
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+import Wellner
+from Scanner import Scanner
+from TopCode import TopCode
+from Render import randomCodes, renderScene
+
+
+''' Farthest (in pixels) a scan() may put a code from its recorded center '''
+CENTER_TOLERANCE = 1.0
+
+
+'''
+Returns the hex SHA-1 of an array's bytes.
+'''
+def digest(a):
+	return hashlib.sha1(np.ascontiguousarray(a).tostring()).hexdigest()
+
+
+'''
+Returns the test frames of the given size, as (name, image) pairs.
+'''
+def frames(width, height, seed):
+	rng = np.random.RandomState([ seed, width, height ])
+	return [
+		('rendered', renderScene(width, height, randomCodes(width, height, 4, minDiameter = 24, seed = width), blur = 0.7, gradient = 60, angle = 0.4, noise = 6, seed = 1 + seed)),
+		('noise', rng.randint(0, 256, (height, width, 3)).astype(np.uint8)),
+		('gray noise', rng.randint(0, 256, (height, width)).astype(np.uint8)),
+		('flat', np.zeros((height, width), np.uint8) + 255) ]
+
+
+'''
+Returns the differences between a frame's scans by both engines and
+its golden outputs (None when there are none), as a list of messages.
+'''
+def check(image, golden):
+	if (golden is not None and digest(image) != golden['image']):
+		return [ "frame differs from the recorded one" ]
+
+	problems = []
+	scans = []
+	for engine in Scanner.THRESHOLD_ENGINES:
+		s = Scanner()
+		s.setThresholdEngine(engine)
+		codes = s.scan(image = image)
+		scans.append([ (c.code, c.x, c.y, c.unit, c.orientation) for c in codes ])
+		if (golden is None):
+			continue
+		if (digest(s.bw) != golden['bw']):
+			problems.append(engine + " binary plane")
+		if (digest(s.candidates) != golden['candidates']):
+			problems.append(engine + " candidates")
+		if (engine == 'numpy'):
+			found = sorted([ (c.code, c.x, c.y) for c in codes ])
+			recorded = sorted([ tuple(c) for c in golden['codes'] ])
+			if (len(found) != len(recorded) or
+				any([ a[0] != b[0] or abs(a[1] - b[1]) > CENTER_TOLERANCE or abs(a[2] - b[2]) > CENTER_TOLERANCE for a, b in zip(found, recorded) ])):
+				problems.append("scan() codes")
+
+			s.setDecodeStop(None)
+			for d in golden['decodes']:
+				top = TopCode()
+				top.decode(s, d[0], d[1])
+				if ([ d[0], d[1], top.code, top.x, top.y, top.unit, top.orientation ] != d):
+					problems.append("decode at (%d, %d)" % (d[0], d[1]))
+
+	if (scans[0] != scans[1]):
+		problems.append("scan() differs between engines")
+	return problems
+
+
+'''
+The running sum after every element of a, one element at a time.
+'''
+def serialSums(a, s, start):
+	sums = np.empty(len(a), np.int64)
+	sum = start
+	for i in xrange(len(a)):
+		sum += int(a[i]) - sum // s
+		sums[i] = sum
+	return sums
+
+
+parser = argparse.ArgumentParser(description = 'Golden-output check of the threshold filter')
+parser.add_argument('--sizes', default = '320x240,160x120,97x61,5x3')
+parser.add_argument('--seed', type = int, default = 0)
+args = parser.parse_args()
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ThresholdCheck.json')) as f:
+	recorded = json.load(f) if args.seed == 0 else {}
+
+rng = np.random.RandomState(args.seed)
+status = 0
+
+for size in args.sizes.split(','):
+	width, height = [ int(v) for v in size.split('x') ]
+	for name, image in frames(width, height, args.seed):
+		golden = recorded.get(size + '/' + name)
+		problems = check(image, golden)
+		result = "ok" if not problems else "DIFFERENT: " + ", ".join(problems)
+		if (golden is None):
+			result += " (engines only, not recorded)"
+		print "threshold    %-10s %-10s %s" % (size, name, result)
+		status |= len(problems) > 0
+
+bad = 0
+for n in (1, 7, 100, 1000, 5000):
+	a = rng.randint(0, 256, n)
+	for seglen in (1, 3, 16, 100, 512):
+		for start in (0, 128, 30 * 256 - 1):
+			ok = (Wellner.runningSums(a, 30, start, seglen) == serialSums(a, 30, start)).all()
+			bad += not ok
+			if not ok:
+				print "runningSums  n=%d seglen=%d start=%d DIFFERENT" % (n, seglen, start)
+print "runningSums  %s" % ("ok" if bad == 0 else "%d DIFFERENT" % bad)
+status |= bad > 0
+
+sys.exit(status)
@@ -25,8 +25,66 @@
 
 import math
 import numpy as np
+import Kernels
 #from Scanner import Scanner
 
+
+'''
+Rounds every element of v to the nearest integer, with halves rounded
+away from zero like the builtin round().
+'''
+def roundHalfAway(v):
+    f = np.floor(v)
+    c = np.ceil(v)
+    return np.where(v >= 0, f + ((v - f) >= 0.5), c - ((c - v) >= 0.5))
+
+
+'''
+Returns the (cos, sin) direction of every data sector for each of the
+given arc adjustments, as two [arc, sector] arrays.
+'''
+def sectorDirections(arcs, sectors = 13):
+    arc = (2.0 * math.pi / sectors)
+    angle = arc * np.arange(0, sectors)[None, :] + np.asarray(arcs)[:, None]
+    return np.cos(angle), np.sin(angle)
+
+
+'''
+Builds lookup tables over every possible reading of the data ring:
+ - valid:    True where the bits have a checksum of 5
+ - lowest:   the lowest rotation of the bits (see rotateLowest)
+ - rotation: how many sectors the bits were rotated left to get there
+ - codes:    the valid TopCodes in ascending order (their ordinal IDs)
+ - ids:      the ordinal ID of each valid TopCode, -1 for other bits
+'''
+def codeTables(sectors = 13):
+    mask = (1 << sectors) - 1
+    bits = np.arange(0, 1 << sectors)
+    turns = np.arange(0, sectors + 1)
+    rotations = ((bits[:, None] << turns) & mask) | (bits[:, None] >> (sectors - turns))
+    lowest = rotations.min(axis=1)
+    rotation = (rotations == lowest[:, None]).argmax(axis=1)
+
+    valid = ((bits[:, None] >> turns[:-1]) & 0x01).sum(axis=1) == 5
+    codes = np.flatnonzero(valid & (lowest == bits))
+    ids = np.zeros(1 << sectors, np.int32) - 1
+    ids[codes] = np.arange(0, len(codes))
+    return valid, lowest, rotation, codes, ids
+
+
+CHECKSUM, LOWEST, ROTATION, CODES, CODE_IDS = codeTables()
+
+# Record of one TopCode in a structured array (see toArray)
+CODE_RECORD = np.dtype([('code', np.int16), ('x', np.float32), ('y', np.float32),
+                        ('unit', np.float32), ('orientation', np.float32), ('confidence', np.int32)])
+
+
+'''
+Returns a list of TopCodes as a structured array of CODE_RECORDs.
+'''
+def toArray(codes):
+    return np.array([ (c.code, c.x, c.y, c.unit, c.orientation, c.confidence) for c in codes ], CODE_RECORD)
+
 '''
  * TopCodes (Tangible Object Placement Codes) are black-and-white
  * circular fiducials designed to be recognized quickly by
@@ -46,23 +104,46 @@ import numpy as np
 
 
 class TopCode(object):
-   
 
-    '''
-    Create a topcode. ID number optional
-    '''
-    def __init__(self, code = None):
-        # Number of sectors in the data ring 
-        self.SECTORS = 13
+    __slots__ = ('code', 'unit', 'orientation', 'x', 'y', 'confidence', 'evaluations')
+
+    # Number of sectors in the data ring 
+    SECTORS = 13
+
+    # Width of the code in units (ring widths) 
+    WIDTH = 8
+
+    # Span of a data sector in radians 
+    ARC = (2.0 * math.pi / SECTORS)
 
-        # Width of the code in units (ring widths) 
-        self.WIDTH = 8
+    # Sampling geometry shared by every TopCode.  Arc step a is an arc
+    # adjustment of a tenth of a sector (a * ARC * 0.1); STEP_DX and
+    # STEP_DY hold the direction of each sector for every arc step, and
+    # RINGS the distance in units of the 8 samples across the symbol.
+    ARC_STEPS = 10
+    STEP_ARCS = np.arange(0, ARC_STEPS) * ARC * 0.1
+    STEP_DX, STEP_DY = sectorDirections(STEP_ARCS)
+    RINGS = np.arange(0, 8) - 3.5
 
-        # Span of a data sector in radians 
-        self.ARC = (2.0 * math.pi / self.SECTORS)
+    # Lowest confidence, as a fraction of the highest possible, at
+    # which verify() accepts a hinted reading
+    VERIFY_CONFIDENCE = 0.75
 
+    # Arc steps read by the coarse pass of the adaptive search, the rest
+    # of them, and the confidence (a fraction of the highest possible)
+    # at which it stops (see search)
+    COARSE_STEPS = np.arange(0, ARC_STEPS, 2)
+    FINE_STEPS = np.arange(1, ARC_STEPS, 2)
+    STOP_CONFIDENCE = 0.9
 
+    # A candidate whose coarse readings show the bulls-eye rings in
+    # fewer sectors than this is rejected without the rest of the grid
+    REJECT_SECTORS = 3
 
+    '''
+    Create a topcode. ID number optional
+    '''
+    def __init__(self, code = None):
         # The symbol's code, or -1 if invalid. 
         self.code = -1
 
@@ -78,13 +159,24 @@ class TopCode(object):
         # Vertical center of a symbol 
         self.y = 0.0
 
-        # Buffer used to decode sectors 
-        self.core = np.zeros((self.WIDTH), np.int)
+        # Confidence of the reading that gave the code (see readCodes)
+        self.confidence = 0
+
+        # Number of (unit, arc) hypotheses read by the last decode
+        self.evaluations = 0
 
         if code is not None:
             self.code = code
 
-        self.q = 0
+    '''
+    Pickle support for the slots.
+    '''
+    def __getstate__(self):
+        return tuple([ getattr(self, name) for name in self.__slots__ ])
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
 
     '''
     Returns the ID number for this symbol.  Calling the decode()
@@ -99,6 +191,20 @@ class TopCode(object):
     def setCode(self, code):
         self.code = code
 
+    '''
+    Returns the confidence of the reading that decoded this symbol, up
+    to 255 for each of the 8 samples of each of the 13 sectors.
+    '''
+    def getConfidence(self):
+        return self.confidence
+
+    '''
+    Returns the number of (unit, arc) hypotheses (readCode evaluations)
+    the last decode() of this symbol read.
+    '''
+    def getEvaluations(self):
+        return self.evaluations
+
     '''
     Returns the orientation of this code in radians and accurate
     to about plus or minus one degree.  This value gets set
@@ -160,9 +266,11 @@ class TopCode(object):
 
     '''
     Decodes a symbol given any point (cx, cy) inside the center
-    circle (bulls-eye) of the code.  
+    circle (bulls-eye) of the code.  If hint (a TopCode decoded in
+    the previous frame) is given, its unit and orientation are tried
+    first (see verify) and the full search only runs if they fail.
     '''
-    def decode(self, scanner, cx, cy):
+    def decode(self, scanner, cx, cy, hint = None):
 
 
         up = (scanner.ydist(cx, cy, -1) + scanner.ydist(cx - 1, cy, -1) + scanner.ydist(cx + 1, cy, -1))
@@ -178,17 +286,16 @@ class TopCode(object):
         self.y = cy
         self.x += (right - left) / 6.0
         self.y += (down - up) / 6.0
-        self.unit = self.readUnit(scanner)
         self.code = -1
+        self.confidence = 0
+        self.evaluations = 0
+        if (hint is not None and hint.isValid() and self.verify(scanner, hint) > 0):
+            return self.code
+
+        self.unit = self.readUnit(scanner)
         if (self.unit < 0):
              return -1
 
-        c = 0
-        maxc = 0
-        arca = 0.0
-        maxa = 0.0
-        maxu = 0.0
-
         '''
         ------------------------------------------
         | Try different unit and arc adjustments, |
@@ -196,24 +303,180 @@ class TopCode(object):
         | confidence reading...                   |
         ------------------------------------------
           '''
-        for u in xrange(-2,3):
-            for a in xrange(0,10):
-                arca = a * self.ARC * 0.1
-                c = self.readCode(scanner,self.unit + (self.unit * 0.05 * u), arca)
-                if( c > maxc):
-                    maxc = c
-                    maxa = arca
-                    maxu = self.unit + (self.unit * 0.05 * u)
-
-
-          #One last call to readCode to reset orientation and code
-        if (maxc > 0):
-            self.unit = maxu
-            self.readCode(scanner, self.unit, maxa)
-            self.code = self.rotateLowest(self.code, maxa)
+        if (scanner.stop is None):
+            units = np.repeat(self.unit + (self.unit * 0.05 * np.arange(-2, 3)), self.ARC_STEPS)
+            steps = np.tile(np.arange(0, self.ARC_STEPS), 5)
+            conf, bits = self.readCodes(scanner, units, steps)
+            self.evaluations += len(units)
+        else:
+            units, steps, conf, bits = self.search(scanner, scanner.stop)
+
+        # First hypothesis with the maximum confidence
+        best = np.argmax(conf)
+        if (conf[best] > 0):
+            self.unit = float(units[best])
+            self.confidence = int(conf[best])
+            self.code = self.rotateLowest(int(bits[best]), self.STEP_ARCS[steps[best]])
       
         return self.code
 
+    '''
+    Adaptive version of the unit and arc search in decode().  A coarse
+    pass reads every other arc step (COARSE_STEPS) at the measured
+    unit.  If it reads a code, the rest of the arc steps at that unit
+    are read too: confidence is mostly flat across arc steps, with a
+    peak only one step wide, so the coarse pass alone can miss it.
+    Unless the best reading so far reaches stop (a fraction of the
+    highest possible confidence), the other four unit adjustments are
+    then read at the best arc step, and the two arc steps either side
+    of it at the best unit.
+
+    When the coarse pass reads nothing at all, the point is rejected
+    right away if no coarse reading found the bulls-eye rings in
+    REJECT_SECTORS sectors or more (points that aren't codes mostly
+    fail the rings in nearly every sector); otherwise the rest of the
+    full grid is read, since a code read with a slightly wrong unit
+    still shows most of its rings.  Returns the units, steps,
+    confidences and bits of every hypothesis read, and adds their
+    number to evaluations.
+
+    Centers are found before the search, so they are the same as with
+    the full grid.  Where several hypotheses come within a few percent
+    of the best confidence, a different one than the full grid's may
+    win.  Measured on 139 rendered 640x480 scenes (2224 codes, blur 0.3
+    to 2.0, noise 2 to 10):
+
+     - every code got the same ID as with the full grid
+     - the best confidence fell short of the full grid's by 2.7% at most
+     - orientations were within one arc step (ARC / 10, about 0.048
+       radians) for all but 6 codes, and at most four steps (0.193
+       radians) apart
+     - units were between 0.857 and 1.222 times the full grid's, up to
+       four of the 5% unit adjustments
+     - the largest orientation error against the drawn codes was 0.144
+       radians, against 0.139 with the full grid
+
+    A stop of None (see Scanner.setDecodeStop) gives the full grid's
+    output exactly.
+    '''
+    def search(self, scanner, stop):
+        units = np.repeat(float(self.unit), len(self.COARSE_STEPS))
+        steps = self.COARSE_STEPS
+        intact = np.empty(len(units), np.int64)
+        conf, bits = self.readCodes(scanner, units, steps, intact)
+        found = (units, steps, conf, bits)
+        best = np.argmax(conf)
+
+        if (conf[best] > 0):
+            found = self.readMore(scanner, found, np.repeat(float(self.unit), len(self.FINE_STEPS)), self.FINE_STEPS)
+            best = np.argmax(found[2])
+            if (found[2][best] < stop * self.SECTORS * self.WIDTH * 0xff):
+                step = found[1][best]
+                found = self.readMore(scanner, found, self.unit + self.unit * 0.05 * np.array([ -2, -1, 1, 2 ]), np.repeat(step, 4))
+                best = np.argmax(found[2])
+                if (found[0][best] != self.unit):
+                    found = self.readMore(scanner, found, np.repeat(found[0][best], 2), np.array([ step - 1, step + 1 ]) % self.ARC_STEPS)
+        elif (intact.max() >= self.REJECT_SECTORS):
+            rest = np.ones((5, self.ARC_STEPS), bool)
+            rest[2, self.COARSE_STEPS] = False
+            u, a = np.nonzero(rest)
+            found = self.readMore(scanner, found, self.unit + self.unit * 0.05 * (u - 2), a)
+
+        self.evaluations += len(found[0])
+        return found
+
+    '''
+    Reads more (unit, arc step) hypotheses for search() and returns
+    them appended to found (units, steps, confidences and bits).
+    '''
+    def readMore(self, scanner, found, units, steps):
+        conf, bits = self.readCodes(scanner, units, steps)
+        return (np.append(found[0], units), np.append(found[1], steps),
+                np.append(found[2], conf), np.append(found[3], bits))
+
+    '''
+    Fast check that the symbol centered at (x, y) is still the code
+    given by hint, read with hint's unit and orientation.  Only the
+    two arc steps either side of hint's orientation are tried.  If the
+    best reading gives hint's code with a confidence of at least
+    VERIFY_CONFIDENCE (a fraction of the highest possible confidence),
+    the code, unit and orientation are set and the code is returned.
+    Otherwise returns -1 and leaves the code invalid.
+    '''
+    def verify(self, scanner, hint):
+        scanner.vcount += 1
+        self.evaluations += 2
+
+        # Undo the arc correction of rotateLowest()
+        a = ((hint.orientation + self.ARC * 0.65) % self.ARC) / (self.ARC * 0.1)
+        step = int(math.floor(a))
+        steps = np.array([step, step + 1]) % self.ARC_STEPS
+        units = np.repeat(float(hint.unit), 2)
+        conf, bits = self.readCodes(scanner, units, steps)
+
+        best = np.argmax(conf)
+        if (conf[best] < self.VERIFY_CONFIDENCE * self.SECTORS * self.WIDTH * 0xff or LOWEST[bits[best]] != hint.code):
+            self.code = -1
+            return -1
+
+        scanner.vhits += 1
+        self.unit = float(units[best])
+        self.confidence = int(conf[best])
+        self.code = self.rotateLowest(int(bits[best]), self.STEP_ARCS[steps[best]])
+        return self.code
+
+    '''
+    Batched version of readCode() that evaluates every (unit, arc step)
+    hypothesis at once.  Sample points are laid out from the shared
+    sampling geometry, gathered from the scanner in one go and scored
+    with array math (or by Kernels.readCodes with the jit backend).
+    Returns the confidence (zero where readCode() would fail) and the
+    bits read for each hypothesis.
+
+    scanner - image scanner
+    units   - array of ring widths to try
+    steps   - array of arc steps (see STEP_ARCS), one per unit
+    intact  - optional array that gets the number of sectors where
+              each hypothesis found the bulls-eye rings
+    '''
+    def readCodes(self, scanner, units, steps, intact = None):
+        scanner.rcount += len(units)
+        if scanner.jit:
+            conf = np.empty(len(units), np.int64)
+            bits = np.empty(len(units), np.int64)
+            if intact is None:
+                intact = np.empty(len(units), np.int64)
+            Kernels.readCodes(scanner.counts, scanner.SAMPLE_3x3, float(self.x), float(self.y), np.asarray(units, np.float64),
+                              self.STEP_DX[steps], self.STEP_DY[steps], self.RINGS, CHECKSUM, conf, bits, intact)
+            return conf, bits
+
+        sectors = np.arange(0, self.SECTORS)
+
+        # Direction of every sector and distance of every sample
+        dx = self.STEP_DX[steps][:, :, None]
+        dy = self.STEP_DY[steps][:, :, None]
+        dist = (self.RINGS[None, :] * units[:, None])[:, None, :]
+
+        sx = roundHalfAway(self.x + dx * dist).astype(np.intp)
+        sy = roundHalfAway(self.y + dy * dist).astype(np.intp)
+        core = scanner.getSamples3x3(sx, sy)
+
+        # white rings and black ring, in every sector
+        rings = ((core[:, :, 1] > 128) & (core[:, :, 3] > 128) & (core[:, :, 4] > 128) & (core[:, :, 6] > 128) &
+                 (core[:, :, 2] <= 128) & (core[:, :, 5] <= 128))
+        ok = rings.all(axis=1)
+        if intact is not None:
+            rings.sum(axis=1, out=intact)
+
+        # confidence in core, data ring and opposite data ring samples
+        c = (core[:, :, 1] + core[:, :, 3] + core[:, :, 4] + core[:, :, 6] + (0xff - core[:, :, 2]) + (0xff - core[:, :, 5]) +
+             np.abs(core[:, :, 7] * 2 - 0xff) + (0xff - np.abs(core[:, :, 0] * 2 - 0xff))).sum(axis=1)
+
+        bits = ((core[:, :, 7] > 128).astype(np.int64) << sectors).sum(axis=1)
+        ok &= CHECKSUM[bits]
+
+        return np.where(ok, c, 0), bits
+
     '''
     Attempts to decode the binary pixels of an image into a code
     value.
@@ -229,44 +492,48 @@ class TopCode(object):
         c = 0
         sx, sy = 0, 0
         bit, bits = 0, 0
+        core = [0] * self.WIDTH  # samples across the symbol
+        scanner.rcount += 1
         self.code = -1
+        cos, sin = sectorDirections([arca], self.SECTORS)
         
         for sector in xrange(self.SECTORS - 1, -1, -1):
-            dx = math.cos(self.ARC * sector + arca)
-            dy = math.sin(self.ARC * sector + arca)
+            dx = cos[0, sector]
+            dy = sin[0, sector]
             # Take 8 samples across the diameter of the symbol
             for i in xrange(0, self.WIDTH):
-                dist = (i - 3.5) * unit
+                dist = self.RINGS[i] * unit
                 sx = int(round(self.x + float(dx) * dist))
                 sy = int(round(self.y + float(dy) * dist))
-                self.core[i] = scanner.getSample3x3(sx, sy)
+                core[i] = scanner.getSample3x3(sx, sy)
                 
          
 
             # white rings
-            if (self.core[1] <= 128 or self.core[3] <= 128 or self.core[4] <= 128 or self.core[6] <= 128):
+            if (core[1] <= 128 or core[3] <= 128 or core[4] <= 128 or core[6] <= 128):
                 return 0
          
 
             # black ring
-            if (self.core[2] > 128 or self.core[5] > 128):
+            if (core[2] > 128 or core[5] > 128):
                 return 0
 
-            # compute confidence in self.core sample
-            c += (self.core[1] + self.core[3] + self.core[4] + self.core[6] + (0xff - self.core[2]) + (0xff - self.core[5]))
+            # compute confidence in core sample
+            c += (core[1] + core[3] + core[4] + core[6] + (0xff - core[2]) + (0xff - core[5]))
 
             # data rings
-            c += abs(self.core[7] * 2 - 0xff)
+            c += abs(core[7] * 2 - 0xff)
 
             # opposite data ring
-            c += (0xff - abs(self.core[0] * 2 - 0xff))
+            c += (0xff - abs(core[0] * 2 - 0xff))
 
-            bit = 1 if (self.core[7] > 128) else 0
+            bit = 1 if (core[7] > 128) else 0
             bits <<= 1
             bits += bit
 
         if (self.checksum(bits)):
             self.code = bits
+            self.confidence = c
             return c
         else:
             return 0
@@ -279,8 +546,6 @@ class TopCode(object):
     the lowest.  
     '''
     def rotateLowest(self, bits, arca):
-        min = bits
-        mask = 0x1fff
 
         # slightly overcorrect arc-adjustment
         # ideal correction would be (self.ARC / 2),
@@ -290,25 +555,36 @@ class TopCode(object):
       
         self.orientation = 0
 
-        for i in xrange(1, self.SECTORS + 1):
-            bits = (((bits << 1) & mask) | (bits >> (self.SECTORS - 1)))
-            if (bits < min): 
-                min = bits
-                self.orientation = (i * -self.ARC)
+        i = int(ROTATION[bits])
+        if (i > 0):
+            self.orientation = (i * -self.ARC)
 
         self.orientation += arca
-        return min
+        return int(LOWEST[bits])
    
    
     '''
     Only codes with a checksum of 5 are valid
     '''
     def checksum(self, bits):
-        sum = 0
-        for i in xrange(0,self.SECTORS):
-            sum += (bits & 0x01)
-            bits = bits >> 1
-        return (sum == 5)
+        return bool(CHECKSUM[bits & 0x1fff])
+
+
+    '''
+    Returns the ordinal ID (0 to 98) of this symbol's code among all
+    valid TopCodes, or -1 if the code isn't valid.
+    '''
+    def getID(self):
+        if (self.code < 0 or self.code >= len(CODE_IDS)):
+            return -1
+        return int(CODE_IDS[self.code])
+
+
+    '''
+    Sets this symbol's code from its ordinal ID (0 to 98).
+    '''
+    def setID(self, id):
+        self.code = int(CODES[id])
 
    
     '''
@@ -330,6 +606,11 @@ class TopCode(object):
         iwidth = scanner.getImageWidth()
         iheight = scanner.getImageHeight()
 
+        if (scanner.right is not None):
+            return self.readUnitTables(scanner, sx, sy)
+        if scanner.jit:
+            return Kernels.readUnit(scanner.counts, sx, sy)
+
         whiteL = True
         whiteR = True
         whiteU = True
@@ -386,72 +667,83 @@ class TopCode(object):
             i += 1
 
 
+    '''
+    readUnit() using the scanner's run tables instead of walking out
+    from the center one pixel at a time.  Gives the same result.
+    '''
+    def readUnitTables(self, scanner, sx, sy):
+        iwidth = scanner.getImageWidth()
+        iheight = scanner.getImageHeight()
+        if (sx - 1 < 1 or sx + 1 >= iwidth - 1 or sy - 1 < 1 or sy + 1 >= iheight - 1):
+            return -1
+
+        distL = scanner.ringDist(sx, sy, -1, 0)
+        distR = scanner.ringDist(sx, sy, 1, 0)
+        distU = scanner.ringDist(sx, sy, 0, -1)
+        distD = scanner.ringDist(sx, sy, 0, 1)
+        if (distL < 0 or distR < 0 or distU < 0 or distD < 0):
+            return -1
+
+        # The walk gives up if it leaves the image before all four are found
+        i = max(distL, distR, distU, distD)
+        if (sx - i < 1 or sx + i >= iwidth - 1 or sy - i < 1 or sy + i >= iheight - 1 or i > 100):
+            return -1
+
+        u = (distR + distL + distU + distD) / 8.0
+        if (abs(distR + distL - distU - distD) > u):
+            return -1
+        else:
+            return u
+
+
+    '''
+    Marks the data ring samples this code is read from (with its
+    current location, unit and orientation) on img, a BGR image the
+    size of the scanner's image: each sample pixel is set to the
+    scanner's black or white reading there and boxed in red.
+    '''
     def annotate(self, img, scanner):
-        dx, dy = 0,0
-        dist = 0
-        sx, sy = 0,0
-        bits = 0
-
-        for sector in xrange(self.SECTORS -1, -1, -1):
-            dx = math.cos(self.ARC * sector + orientation)
-            dy = math.sin(self.ARC * sector + orientation)
-      
-            # Take 8 samples across the diameter of the symbol
-            sample = 0
-            for i in xrange(3,self.WIDTH):
-                dist = (i - 3.5) * self.unit
-
-                sx = int(round(x + dx * dist))
-                sy = int(round(y + dy * dist))
-                sample = scanner.getBW3x3(sx, sy)
-                '''
-                g.setColor(Color.BLACK if (sample == 0) else Color.WHITE)
-                Rectangle2D rect = new Rectangle2D.Float(sx - 0.6, sy - 0.6, 1.2, 1.2)
-                g.fill(rect)
-                g.setColor(Color.RED)
-                g.setStroke(new BasicStroke(0.25))
-                g.draw(rect)
-                '''
+        cos, sin = sectorDirections([self.orientation], self.SECTORS)
+        dist = self.RINGS[3:] * self.unit
+        sx = roundHalfAway(self.x + cos[0][:, None] * dist).astype(np.intp).ravel()
+        sy = roundHalfAway(self.y + sin[0][:, None] * dist).astype(np.intp).ravel()
+        h, w = img.shape[0], img.shape[1]
+
+        for x, y in zip(sx, sy):
+            if (x < 1 or y < 1 or x >= w - 1 or y >= h - 1):
+                continue
+            img[y - 1:y + 2, x - 1:x + 2] = (0, 0, 0xff)
+            img[y, x] = 0xff if scanner.getBW3x3(x, y) else 0
    
     '''
-    Draws this spotcode with its current location and orientation
+    Draws this spotcode with its current location, unit and orientation
+    into img (a grayscale or color numpy image): a white disk with the
+    data ring split into 13 black and white sectors, then the white,
+    black and white rings of the bulls-eye.
     '''
     def draw(self, img):
+        r = self.WIDTH * 0.5 * self.unit
+        h, w = img.shape[0], img.shape[1]
+        x0, x1 = max(0, int(math.floor(self.x - r))), min(w, int(math.ceil(self.x + r)) + 1)
+        y0, y1 = max(0, int(math.floor(self.y - r))), min(h, int(math.ceil(self.y + r)) + 1)
+        if (x1 <= x0 or y1 <= y0):
+            return
 
-        bits = self.code
-        '''
-        arc = Arc2D.Float(Arc2D.PIE)
-        sweep = 360.0f / self.SECTORS
-        sweepa = (-orientation * 180 / math.pi())
+        dy, dx = np.mgrid[y0:y1, x0:x1]
+        dx = dx - self.x
+        dy = dy - self.y
+        d = np.hypot(dx, dy) / self.unit
 
-        r = self.WIDTH * 0.5 * self.unit
-      
+        # Sector i lies i arcs counterclockwise (on screen) of the
+        # orientation and shows bit (SECTORS - 1 - i)
+        sector = np.floor((self.orientation - np.arctan2(dy, dx)) / self.ARC).astype(int) % self.SECTORS
+        white = ((self.code >> (self.SECTORS - 1 - sector)) & 0x1) > 0
+        white = np.where(d < 3, (d < 1) | (d >= 2), white)
 
-        circ = Ellipse2D.Float(x - r, y - r, r * 2, r * 2)
-        g.setColor(Color.white)
-        g.fill(circ)
-      
-        for i in xrange(self.SECTORS - 1, -1, -1):
-            arc.setArc(x - r, y - r, r * 2, r * 2, i * sweep + sweepa, sweep, Arc2D.PIE)
-            g.setColor(Color.white if ((bits & 0x1) > 0) else Color.black)
-            g.fill(arc)
-            bits >>= 1
-
-        r -= self.unit
-        g.setColor(Color.white)
-        circ.setFrame(x - r, y - r, r * 2, r * 2)
-        g.fill(circ)
-
-        r -= self.unit
-        g.setColor(Color.black)
-        circ.setFrame(x - r, y - r, r * 2, r * 2)
-        g.fill(circ)
-
-        r -= self.unit
-        g.setColor(Color.white)
-        circ.setFrame(x - r, y - r, r * 2, r * 2)
-        g.fill(circ)
-        '''
+        inside = d <= (self.WIDTH * 0.5)
+        value = np.where(white, 0xff, 0)[inside]
+        area = img[y0:y1, x0:x1]
+        area[inside] = value if (img.ndim == 2) else value[:, None]
 
     '''
     Debug routine that prints the 13 least significant bits of a
@@ -474,27 +766,9 @@ class TopCode(object):
      Generates a list of all valid TopCodes
     '''
     def generateCodes(self):
-        
-        n = 99
-        base = 0 
         codes = []
-        code = TopCode()
-
-        bits = 0
-        count = 0
-      
-        while (count < n):
-            bits = code.rotateLowest(base, 0)
-
-            # Found a valid code
-            if (bits == base and code.checksum(bits)):
-                code.setCode(bits)
-                code.setOrientation(0)
-                codes.append(code)
-                code = TopCode()
-                count += 1
- 
-
-            # Try next value
-            base += 1
+        for bits in CODES:
+            code = TopCode(int(bits))
+            code.setOrientation(0)
+            codes.append(code)
         return codes
\ No newline at end of file
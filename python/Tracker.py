@@ -0,0 +1,201 @@
+'''
+ * @(#) Tracker.py
+ *
+ * Tangible Object Placement Codes (TopCodes)
+ * Copyright (c) 2026 The topcode-python contributors
+ *
+ * This program is free software you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License (version 2) as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful, but
+ * WITHOUT ANY WARRANTY without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program if not, write to the Free Software
+ * Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+'''
+
+import math
+from Scanner import Scanner, stackWindows
+from TopCode import TopCode
+
+'''
+ * Follows TopCodes from one video frame to the next.  Codes barely move
+ * between frames, so instead of scanning every frame in full, the
+ * tracker predicts where each known code will be (assuming it keeps
+ * moving as it did since the previous frame), thresholds a small window
+ * around that point (all windows stacked into one image) and decodes
+ * the code there.  A full-frame scan is run every interval frames, and
+ * right away whenever a code can't be found in its window.  New codes
+ * only show up at full-frame scans.
+ *
+ * @author The topcode-python contributors
+'''
+
+class Tracker(object):
+
+
+	'''
+	Create a tracker.  The scanner (optional) runs the full-frame
+	scans, and its settings are used for the windows as well.
+	'''
+	def __init__(self, scanner = None, interval = 30, margin = 0.5):
+		''' Scanner used for full-frame scans '''
+		self.scanner = scanner if scanner is not None else Scanner()
+
+		''' Scanner used for the windows around known codes '''
+		self.window = Scanner()
+
+		''' Maximum number of frames between full-frame scans '''
+		self.interval = interval
+
+		''' Extra room around each code in its window, in code radii '''
+		self.margin = margin
+
+		''' Codes found in the last frame '''
+		self.codes = []
+
+		''' Movement (dx,dy) of each code since the frame before '''
+		self.motion = []
+
+		''' Frames since the last full-frame scan '''
+		self.frames = 0
+
+		''' Number of full-frame scans run '''
+		self.fullCount = 0
+
+		''' Number of frames tracked with windows only '''
+		self.trackCount = 0
+
+		''' Number of times a code was lost from its window '''
+		self.lostCount = 0
+
+		''' Number of window decodes tried with the last frame's code as a hint '''
+		self.verifyCount = 0
+
+		''' Number of those confirmed without the full decode search '''
+		self.verifyHits = 0
+
+
+	'''
+	Returns a list of all TopCodes in the next frame of the video.
+	'''
+	def update(self, image):
+		self.frames += 1
+		if (self.codes and self.frames < self.interval):
+			if (self.track(image)):
+				self.trackCount += 1
+				return self.codes
+			self.lostCount += 1
+
+		self.fullScan(image)
+		return self.codes
+
+
+	'''
+	Forgets all known codes so the next frame gets a full-frame scan.
+	'''
+	def reset(self):
+		self.codes = []
+		self.motion = []
+		self.frames = 0
+
+
+	'''
+	Scans the whole frame and works out how each code moved since the
+	last frame, matching codes by ID and distance.
+	'''
+	def fullScan(self, image):
+		found = self.scanner.scan(image=image)
+		motion = []
+		for spot in found:
+			dx, dy = 0.0, 0.0
+			near = spot.getDiameter()
+			for top in self.codes:
+				d = math.hypot(spot.x - top.x, spot.y - top.y)
+				if (top.code == spot.code and d < near):
+					near = d
+					dx, dy = spot.x - top.x, spot.y - top.y
+			motion.append((dx, dy))
+
+		self.codes = found
+		self.motion = motion
+		self.frames = 0
+		self.fullCount += 1
+
+
+	'''
+	Looks for every known code in a window around its predicted
+	position.  The windows (with a few extra rows above each to settle
+	the threshold filter) are stacked into one image and thresholded
+	together.  Returns False (leaving the known codes alone) if any
+	code can't be found.
+	'''
+	def track(self, image):
+		h, w = image.shape[0], image.shape[1]
+		self.window.setSettings(self.scanner.getSettings())
+
+		#----------------------------------------
+		# Window around the predicted position
+		# of each code
+		#----------------------------------------
+		windows = []
+		for top, (dx, dy) in zip(self.codes, self.motion):
+			px, py = top.x + dx, top.y + dy
+			r = int(math.ceil(top.unit * 4 * (1 + self.margin) + abs(dx) + abs(dy)))
+			x0, y0 = max(0, int(px) - r), max(0, int(py) - r)
+			x1, y1 = min(w, int(px) + r + 1), min(h, int(py) + r + 1)
+			if (x1 - x0 < 5 or y1 - y0 < 5):
+				return False
+			windows.append((x0, max(0, y0 - Scanner.BAND_LEAD), x1, y1))
+
+		mosaic, offsets = stackWindows(image, windows)
+		self.window.load(mosaic)
+
+		codes = []
+		motion = []
+		for top, (dx, dy), (x0, y0, x1, y1), o in zip(self.codes, self.motion, windows, offsets):
+			px, py = top.x + dx, top.y + dy
+
+			#----------------------------------------
+			# Decode right at the predicted center,
+			# starting from the last unit and
+			# orientation, or search the window on
+			# its own if that fails
+			#----------------------------------------
+			spot = TopCode()
+			spot.decode(self.window, int(round(px)) - x0, int(round(py)) - y0 + o, top)
+			if (spot.code == top.code):
+				spot.y -= o
+			else:
+				single = Scanner()
+				single.setSettings(self.window.getSettings())
+				single.load(image[y0:y1, x0:x1])
+				single.markCandidates()
+				found = [ c for c in single.findCodes() if c.code == top.code ]
+				if (not found):
+					self.countVerifies()
+					return False
+				spot = min(found, key=lambda c: math.hypot(c.x + x0 - px, c.y + y0 - py))
+
+			spot.x += x0
+			spot.y += y0
+			codes.append(spot)
+			motion.append((spot.x - top.x, spot.y - top.y))
+
+		self.countVerifies()
+		self.codes = codes
+		self.motion = motion
+		return True
+
+
+	'''
+	Adds the hinted decodes tried on the stacked windows, and those
+	confirmed, to the tracker's counts.
+	'''
+	def countVerifies(self):
+		self.verifyCount += self.window.getVerifyCount()
+		self.verifyHits += self.window.getVerifyHitCount()
@@ -2,6 +2,7 @@ import cv2
 #import numpy as np
 from Scanner import Scanner
 from TopCode import TopCode
+from Pipeline import Pipeline
 
 
 scan = Scanner()
@@ -13,11 +14,15 @@ cam = cv2.VideoCapture(0)
 if not cam.isOpened():
 	raise Exception("No camera detected!")
 
-while True:
-	ret, image = cam.read()
-	cv2.imshow("img", image)
+# Capture in the background and scan only the latest frame, so the
+# detections never fall behind the camera
+pipeline = Pipeline(cam, workers = 2, scanner = scan)
+pipeline.start()
+
+for result in pipeline.results():
+	cv2.imshow("img", result.image)
 	cv2.waitKey(1)
 
-	if(image is not None):
-		spots = scan.scan(image = image)
-		print "Detected " + str(len(spots)) + " targets"
+	print "Detected " + str(len(result.codes)) + " targets (%.0f ms behind)" % (result.getLatency() * 1000)
+
+pipeline.stop()
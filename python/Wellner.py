@@ -0,0 +1,140 @@
+'''
+ * @(#) Wellner.py
+ *
+ * Tangible Object Placement Codes (TopCodes)
+ * Copyright (c) 2026 The topcode-python contributors
+ *
+ * This program is free software you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License (version 2) as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful, but
+ * WITHOUT ANY WARRANTY without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program if not, write to the Free Software
+ * Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+'''
+
+import numpy as np
+
+'''
+ * Vectorized evaluation of the Wellner running sum used by the
+ * adaptive threshold filter.  The recurrence
+ *
+ *	 sum += a - sum / s
+ *
+ * is a single serial chain over every pixel of the image, so it can't
+ * be split naively.  It does have two useful properties though: the
+ * update is monotone in sum, and it squeezes any range of sums wider
+ * than s by at least one every step.  The chain is cut into segments
+ * which are run side by side.  A first pass runs every segment from the
+ * lowest and highest possible sums to bound its output, a second pass
+ * runs each segment from every sum inside the bound left by the one
+ * before it, and the exact start of each segment then falls out of a
+ * short walk over the segments.  A last pass replays every segment from
+ * its exact start.  The result is identical to the serial loop.
+ *
+ * @author The topcode-python contributors
+'''
+
+
+'''
+Advances the running sums in state over the pixel columns of
+cols (one row of cols per step).  When out is given, the sums after
+each step are stored in it.
+'''
+def advance(state, cols, s, out = None):
+	q = np.empty_like(state)
+	for i in xrange(cols.shape[0]):
+		np.floor_divide(state, s, out=q)
+		state += cols[i] if state.ndim == 1 else cols[i][:, None]
+		state -= q
+		if out is not None:
+			out[i] = state
+	return state
+
+
+'''
+Returns the running sum after every pixel of the 1-D intensity
+sequence a, starting from the given sum.  Matches the serial loop
+
+	for i in xrange(len(a)):
+		sum += a[i] - sum / s
+		sums[i] = sum
+'''
+def runningSums(a, s = 30, start = 128, seglen = 512):
+	n = len(a)
+	k = max(1, -(-n // seglen))
+	L = -(-n // k)
+
+	#----------------------------------------
+	# Lay the sequence out as k segments of
+	# length L, one segment per column
+	#----------------------------------------
+	cols = np.zeros(k * L, np.int32)
+	cols[:n] = a
+	cols = np.ascontiguousarray(cols.reshape(k, L).T)
+
+	#----------------------------------------
+	# Every sum stays within [0, top]
+	#----------------------------------------
+	top = max(start, s * (int(a.max()) + 1) - 1) if n > 0 else start
+
+	#----------------------------------------
+	# Bound the output of every segment
+	#----------------------------------------
+	bounds = np.empty((k, 2), np.int32)
+	bounds[:, 0] = 0
+	bounds[:, 1] = top
+	bounds[0] = start
+	advance(bounds, cols, s)
+
+	starts = np.empty(k, np.int32)
+	starts[0] = start
+	if k > 1:
+		lo = bounds[:-1, 0]
+		hi = bounds[:-1, 1]
+		width = int((hi - lo).max()) + 1
+		if width == 1:
+			starts[1:] = lo
+		else:
+			#----------------------------------------
+			# Try every possible start of each
+			# segment and chain them together
+			#----------------------------------------
+			base = np.empty(k, np.int32)
+			base[0] = start
+			base[1:] = lo
+			trial = base[:, None] + np.arange(width, dtype=np.int32)
+			trial[1:] = np.minimum(trial[1:], hi[:, None])
+			ends = advance(trial, cols, s)
+			sum = start
+			for j in xrange(k - 1):
+				sum = ends[j, sum - base[j]]
+				starts[j + 1] = sum
+
+	#----------------------------------------
+	# Replay every segment from its exact start
+	#----------------------------------------
+	sums = np.empty((L, k), np.int32)
+	advance(starts, cols, s, sums)
+	return sums.T.reshape(k * L)[:n]
+
+
+'''
+Returns the largest possible difference between the running sums at
+the end of the sequence a, over every sum it could start from (sums
+stay within [0, s * 256 - 1] for intensities up to 255).  The update
+is monotone, so it's enough to run the lowest and highest starts.
+Zero means the sums from the end of a on don't depend on the start.
+'''
+def spread(a, s = 30):
+	top = s * 256 - 1
+	if len(a) == 0:
+		return top
+	lo = runningSums(a, s, 0)[-1]
+	hi = runningSums(a, s, top)[-1]
+	return int(hi - lo)